@@ -2,25 +2,12 @@
 Function: generate_short_query(long_prompt_string)--> returns shortened prompt.
 """
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 import os
-from API_KEY import API_KEY
 
 # Load environment variables
 load_dotenv()
 
-# Configure the API key
-genai.configure(api_key=API_KEY)
-
-model = genai.GenerativeModel(
-    'gemini-2.5-flash-lite',
-    generation_config=genai.GenerationConfig(
-        temperature=0.7,
-        top_p=1,
-        max_output_tokens=100,
-    ))
-
 def generate_short_query(long_prompt):
     """Shorten a prompt for arXiv, robust to bad inputs like "[object Object]".
 
@@ -1,32 +1,76 @@
+"""arXiv search with one shared client and a TTL cache of query -> results.
+
+The arxiv client enforces its delay between requests per instance, so a
+single client (guarded by a lock) keeps us within arXiv's rate limit across
+concurrent /search calls. Results are cached for ARXIV_CACHE_TTL seconds.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
 import arxiv
 
+ARXIV_CACHE_TTL = int(os.environ.get("ARXIV_CACHE_TTL", "3600"))
+ARXIV_CACHE_SIZE = int(os.environ.get("ARXIV_CACHE_SIZE", "256"))
+
+_client = arxiv.Client(
+    page_size=5,
+    delay_seconds=3,
+    num_retries=3
+)
+_client_lock = threading.Lock()
+_cache = OrderedDict()   # (query, num_results) -> (stored at, results)
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _cache_key(query, num_results):
+    return (" ".join(str(query).lower().split()), num_results)
+
+
 def search_arxiv_papers(query, num_results=5):
-    # Configure the arXiv client
-    client = arxiv.Client(
-        page_size=100,
-        delay_seconds=3,
-        num_retries=3
-    )
-    
+    key = _cache_key(query, num_results)
+    now = time.time()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and now - cached[0] < ARXIV_CACHE_TTL:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return [dict(r) for r in cached[1]]
+        _stats["misses"] += 1
+
     # Define the search parameters
     search = arxiv.Search(
         query=query,
         max_results=num_results,
         sort_by=arxiv.SortCriterion.Relevance  # Sort by relevance
     )
-    
-    # Execute the search
+
+    # Execute the search; fetch only as many results as we return
     results = []
-    for paper in client.results(search):
-        results.append({
-            "title": paper.title,
-            "url": paper.pdf_url
-        })
-    
-    return results
+    with _client_lock:
+        _client.page_size = num_results
+        for paper in _client.results(search):
+            results.append({
+                "title": paper.title,
+                "url": paper.pdf_url
+            })
+
+    with _cache_lock:
+        _cache[key] = (time.time(), results)
+        _cache.move_to_end(key)
+        while len(_cache) > ARXIV_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return [dict(r) for r in results]
+
+
+def search_cache_stats():
+    with _cache_lock:
+        return dict(_stats, entries=len(_cache))
 
 # Example usage
 '''
 papers = search_arxiv_papers("Machine Learning")
 print(papers)
-'''
\ No newline at end of file
+'''
@@ -0,0 +1,96 @@
+# answer_cache.py
+"""In-memory cache of chat_with_doc answers.
+
+Answers are keyed by the document's content hash plus a normalized form of
+the question, so "What dataset is used?" and "what dataset is used" share an
+entry. Answers produced in another form (e.g. bilingual) live in their own
+``namespace`` so they never stand in for each other. When a similarity threshold is configured, a question that misses the
+exact key is also matched against earlier questions on the same document by
+cosine similarity of their embeddings. Entries expire after ``ttl`` seconds
+and the least recently used ones are dropped beyond ``max_entries``.
+"""
+import os
+import re
+import copy
+import math
+import time
+import threading
+from collections import OrderedDict
+
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = int(os.environ.get("ANSWER_CACHE_TTL", str(6 * 3600)))
+# 0 disables near-duplicate matching; ~0.95 catches rephrasings of the same question
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0"))
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(re.findall(r"[^\W_]+", (question or "").lower()))
+
+
+def _cosine(a: list, b: list) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    if not na or not nb:
+        return 0.0
+    return dot / (na * nb)
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: int = ANSWER_CACHE_TTL,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # (doc_hash, namespace, normalized question) -> (expires, embedding, payload)
+        self._lock = threading.Lock()
+
+    def get(self, doc_hash: str, question: str, embedding: list = None, namespace: str = ""):
+        """Return a copy of the cached payload, or None."""
+        key = (doc_hash, namespace, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                entry = None
+            if entry is None and embedding is not None and self.similarity > 0:
+                best, best_score = None, self.similarity
+                for other_key, (expires, other_emb, _) in self._entries.items():
+                    if other_key[:2] != key[:2] or other_emb is None or expires < now:
+                        continue
+                    score = _cosine(embedding, other_emb)
+                    if score >= best_score:
+                        best, best_score = other_key, score
+                if best is not None:
+                    key, entry = best, self._entries[best]
+                    self.semantic_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def put(self, doc_hash: str, question: str, payload: dict, embedding: list = None, namespace: str = "") -> None:
+        key = (doc_hash, namespace, normalize_question(question))
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, embedding, copy.deepcopy(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+
+answer_cache = AnswerCache()
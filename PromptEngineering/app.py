@@ -7,45 +7,46 @@ import requests
 import subprocess
 import base64
 import time
-import tempfile
+import json
+from concurrent.futures import ThreadPoolExecutor
 
 from pathlib import Path
 from flask import (
     Flask, render_template_string, jsonify, request,
-    abort, url_for, send_file, Response, make_response
+    abort, url_for, send_file, Response, make_response, stream_with_context, g
 )
 from flask_cors import CORS, cross_origin
-from pdf_utils import cleanup_old_pdfs
 
-import fitz  # PyMuPDF
-from elevenlabs import ElevenLabs
-import google.generativeai as genai
-try:
-    from google.cloud import speech as google_speech
-except Exception:
-    google_speech = None
+import pdf_text
+import speech
+import llm_gateway
+import metrics
 
 def extract_pdf_text(pdf_path):
     """Extract all text content from a PDF file"""
     try:
-        doc = fitz.open(pdf_path)
-        full_text = ""
-        for page_num in range(doc.page_count):
-            page = doc.load_page(page_num)
-            page_text = page.get_text()
-            full_text += page_text + "\n\n"
-        doc.close()
-        return full_text.strip()
+        return pdf_text.full_text(pdf_path)
     except Exception as e:
         logging.error(f"Failed to extract text from PDF: {e}")
         return ""
 
-from rag import reload_rag_model, get_contextual_definition, chat_with_doc
+from rag import (
+    reload_rag_model, get_contextual_definition, chat_with_doc, stream_chat_with_doc,
+    chat_with_doc_bilingual, stream_chat_with_doc_bilingual, get_ingest_progress, document_size
+)
 from data_extraction import extract_sections
+from embedding_cache import embedding_cache
+from answer_cache import answer_cache
+from translation_cache import translation_cache
+from pdf_cache import pdf_cache
+from doc_digest import document_digest, summary_store
+from mindmap_cache import mindmap_cache
+from tts_cache import tts_cache, tts_key
+from tts_pipeline import split_sentences, pipelined_audio
 from Research_paper_function import generate_short_query
-from Search_Papers_Arvix import search_arxiv_papers
-from pdf_utils import ensure_pdf_loaded, current_pdf_path, model_loading, download_pdf
-from API_KEY import ELEVENLABS_API_KEY
+from Search_Papers_Arvix import search_arxiv_papers, search_cache_stats
+from pdf_utils import ensure_pdf_loaded, download_pdf, prefetch_pdfs
+from sessions import sessions, DEFAULT_SESSION
 from werkzeug.utils import secure_filename
 import shutil
 
@@ -55,6 +56,11 @@ app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": ["http://localhost:3000", "*"]}}, supports_credentials=False)
 logging.basicConfig(level=logging.INFO)
 
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
 # Ensure preflight (OPTIONS) succeeds and attach CORS headers consistently
 @app.before_request
 def _handle_preflight():
@@ -81,29 +87,56 @@ def _add_cors_headers(resp):
         pass
     return resp
 
-def start_cleanup_thread(interval=30, max_age=60):
-    def run_cleanup():
-        while True:
-            cleanup_old_pdfs(max_age=max_age)
-            time.sleep(interval)
 
-    thread = threading.Thread(target=run_cleanup, daemon=True)
-    thread.start()
+@app.after_request
+def _record_request(resp):
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=resp.status_code)
+    started = g.get("request_started")
+    if started is not None:
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method)
+    return resp
 
 # ─── PDF + RAG Utility ─────────────────────────────────────────────────────────
-def process_text(selection: str):
-    return {"analysis": get_contextual_definition(selection)}
+def process_text(selection: str, doc_hash: str = None):
+    return {"analysis": get_contextual_definition(selection, doc_hash=doc_hash)}
+
+def _request_field(header: str, name: str):
+    """Value of ``name`` from a header, the query string, the JSON body or the form."""
+    value = request.headers.get(header) or request.args.get(name)
+    if not value:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            value = data.get(name)
+    if not value:
+        value = request.form.get(name)
+    return (value or '').strip() or None
+
+def _request_session_id() -> str:
+    """Session a request belongs to; clients that send none share the default session."""
+    return _request_field('X-Session-Id', 'session_id') or DEFAULT_SESSION
+
+def _resolve_document():
+    """
+    The document a request refers to: an explicit ``document`` content hash
+    if given, else the document its session loaded last. None if neither.
+    """
+    return sessions.resolve(_request_session_id(), _request_field('X-Document', 'document'))
 
 # ─── PDF / RAG Routes ──────────────────────────────────────────────────────────
 @app.route('/pdf')
 def serve_pdf():
-    if model_loading or current_pdf_path is None:
+    if sessions.is_loading(_request_session_id()):
         # client can retry after a bit
         return jsonify({"status": "loading"}), 202
+    doc = _resolve_document()
+    if doc is None:
+        # never loaded in this session, or its PDF was evicted from the cache: retrying will not help
+        return jsonify({"status": "not_loaded", "error": "No PDF loaded; load the paper again"}), 404
     
     try:
         # Add proper headers for PDF serving
-        response = send_file(current_pdf_path, mimetype='application/pdf')
+        response = send_file(doc["pdf_path"], mimetype='application/pdf')
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = 'inline; filename="research_paper.pdf"'
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -120,8 +153,11 @@ def handle_selection():
     selection = data.get('text','').strip()
     if not selection:
         return jsonify(error="Empty selection"), 400
+    doc = _resolve_document()
+    if doc is None:
+        return jsonify(error="No PDF loaded"), 400
     try:
-        return jsonify(process_text(selection))
+        return jsonify(process_text(selection, doc["doc_hash"]))
     except Exception as e:
         return jsonify(error=str(e)), 500
 
@@ -129,13 +165,15 @@ def handle_selection():
 def ask_question():
     data     = request.get_json(silent=True) or {}
     question = data.get('question','').strip()
-    pdf_url  = data.get('pdfUrl', current_pdf_path).strip()
 
     if not question:
         return jsonify(error="Question cannot be empty"), 400
+    doc = _resolve_document()
+    if doc is None:
+        return jsonify(error="No PDF loaded"), 400
 
     try:
-        answer = chat_with_doc(question)
+        answer = chat_with_doc(question, doc_hash=doc["doc_hash"])
         # Support both legacy string and new dict reply with page number
         if isinstance(answer, dict):
             return jsonify(answer=answer.get("text"), page=answer.get("page"), snippet=answer.get("snippet"), anchors=answer.get("anchors"))
@@ -144,6 +182,46 @@ def ask_question():
     except Exception as e:
         return jsonify(error=str(e)), 500
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events):
+    headers = {
+        "Cache-Control": "no-cache",
+        # keep proxies (nginx, Cloud Run front ends) from buffering the stream
+        "X-Accel-Buffering": "no",
+    }
+    return Response(stream_with_context(events), mimetype="text/event-stream", headers=headers)
+
+
+@app.route('/ask-stream', methods=['POST'])
+def ask_question_stream():
+    """Server-sent events version of /ask: meta (page/snippet/anchors), token..., done."""
+    data     = request.get_json(silent=True) or {}
+    question = data.get('question','').strip()
+    if not question:
+        return jsonify(error="Question cannot be empty"), 400
+    doc = _resolve_document()
+    if doc is None:
+        return jsonify(error="No PDF loaded"), 400
+
+    def events():
+        try:
+            for event, payload in stream_chat_with_doc(question, doc_hash=doc["doc_hash"]):
+                if event == "token":
+                    yield _sse("token", {"text": payload})
+                elif event == "done":
+                    yield _sse("done", {"answer": payload.get("text"), "page": payload.get("page"),
+                                        "snippet": payload.get("snippet"), "anchors": payload.get("anchors")})
+                else:
+                    yield _sse(event, payload)
+        except Exception as e:
+            logging.exception("/ask-stream failed")
+            yield _sse("error", {"error": str(e)})
+
+    return _sse_response(events())
+
 @app.route('/update-pdf', methods=['POST','OPTIONS'])
 def update_pdf():
     if request.method == 'OPTIONS':
@@ -153,6 +231,8 @@ def update_pdf():
     new_link= data.get('link','').strip()
     if not new_link:
         return jsonify(error="Missing 'link'"), 400
+    # progressive: return once the first pages are indexed, keep embedding the rest in background
+    progressive = bool(data.get('progressive', False))
 
     # synchronously download + reload
     try:
@@ -161,12 +241,14 @@ def update_pdf():
         if not os.path.isfile(abs_path):
             return jsonify(error=f"PDF missing at {abs_path}"), 500
 
-        global current_pdf_link, current_pdf_path
-        current_pdf_link = new_link
-        current_pdf_path = abs_path
-        reload_rag_model(current_pdf_path)
+        session_id = _request_session_id()
+        doc_hash = reload_rag_model(abs_path, progressive=progressive)
+        sessions.bind(session_id, doc_hash, abs_path, new_link)
         logging.info("✅ RAG model reloaded.")
-        return jsonify(message="PDF & model updated"), 200
+        if MINDMAP_PREGENERATE or data.get('pregenerate'):
+            pregenerate_mindmaps(abs_path, doc_hash)
+        return jsonify(message="PDF & model updated", document=doc_hash, session_id=session_id,
+                       progress=get_ingest_progress().get(doc_hash)), 200
 
     except Exception as e:
         logging.exception("Error updating PDF")
@@ -174,157 +256,270 @@ def update_pdf():
 
 @app.route('/')
 def index():
+    doc = _resolve_document()
     # Redirect to React frontend
     return jsonify({
         "message": "ResearchAI Backend API",
         "status": "running",
-        "pdf_loaded": current_pdf_path is not None,
-        "pdf_path": current_pdf_path,
+        "pdf_loaded": doc is not None,
+        "pdf_path": doc["pdf_path"] if doc else None,
         "frontend": "Please use the React frontend at http://localhost:3000",
         "endpoints": {
             "search": "/search",
             "pdf": "/pdf", 
             "process-selection": "/process-selection",
             "ask": "/ask",
+            "ask-stream": "/ask-stream",
             "mindmap": "/mindmap",
             "update-pdf": "/update-pdf",
             "log-click": "/log-click",
             "transcribe": "/transcribe",
+            "transcribe-stream": "/transcribe-stream",
             "tts": "/tts"
         }
     })
 
 @app.route('/health')
 def health_check():
+    session_id = _request_session_id()
+    doc = sessions.resolve(session_id)
     return jsonify({
         "status": "healthy",
-        "pdf_loaded": current_pdf_path is not None,
-        "model_loading": model_loading,
-        "pdf_path": current_pdf_path
+        "pdf_loaded": doc is not None,
+        "model_loading": sessions.is_loading(session_id),
+        "pdf_path": doc["pdf_path"] if doc else None,
+        "sessions": sessions.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "translation_cache": translation_cache.stats(),
+        "pdf_cache": pdf_cache.stats(),
+        "search_cache": search_cache_stats(),
+        "digest_cache": summary_store.stats(),
+        "mindmap_cache": mindmap_cache.stats(),
+        "tts_cache": tts_cache.stats(),
+        "llm": llm_gateway.stats(),
+        "stt": speech.stats(),
+        "ingest": get_ingest_progress()
     })
 
+# ─── Prometheus Metrics ────────────────────────────────────────────────────────
+_CACHE_STATS = {
+    "embedding": embedding_cache.stats,
+    "answer": answer_cache.stats,
+    "translation": translation_cache.stats,
+    "pdf": pdf_cache.stats,
+    "search": search_cache_stats,
+    "digest": summary_store.stats,
+    "mindmap": mindmap_cache.stats,
+    "tts": tts_cache.stats,
+    "sessions": sessions.stats,
+}
+_CACHE_RESULTS = {"hits": "hit", "semantic_hits": "semantic_hit", "misses": "miss"}
+
+def _component_metrics():
+    """Counters kept by the caches, the LLM gateway and the STT engines, as scrape-time samples."""
+    lookups, other = [], []
+    for component, stats_fn in _CACHE_STATS.items():
+        for stat, value in stats_fn().items():
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if stat in _CACHE_RESULTS:
+                lookups.append(({"cache": component, "result": _CACHE_RESULTS[stat]}, value))
+            else:
+                other.append(({"component": component, "stat": stat}, value))
+    llm = [({"model": model, "stat": stat}, value)
+           for model, s in llm_gateway.stats().items()
+           for stat, value in s.items() if isinstance(value, (int, float))]
+    stt = [({"engine": engine, "stat": stat}, s[stat])
+           for engine, s in speech.stats().items() for stat in ("requests", "errors")]
+    ingesting = sum(1 for p in get_ingest_progress().values() if p.get("status") not in ("ready", "failed"))
+    return [
+        ("woomai_cache_lookups_total", "counter", "Cache lookups by cache and result.", lookups),
+        ("woomai_component_stat", "gauge", "Other numeric counters reported on /health.", other),
+        ("woomai_llm_stat", "gauge", "LLM gateway counters per model.", llm),
+        ("woomai_stt_stat", "gauge", "Speech-to-text requests and errors per engine.", stt),
+        ("woomai_ingest_in_progress", "gauge", "Documents currently being indexed.", [({}, ingesting)]),
+    ]
+
+metrics.register_collector(_component_metrics)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of per-stage timings, HTTP traffic and cache counters."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # ─── Mind Map Generation Route ────────────────────────────────────────────────
+def build_prompt_from_text(prefix_text: str) -> str:
+    return (
+        "You are a research analyst. Perform the following two tasks:\n\n"
+        "First, write a concise, one-sentence summary of the text below.\n\n"
+        "Then, using only the information from your summary, create a simple mind map. The mind map should be in Markdown format with nested bullet points.\n\n"
+        "Text:\n"
+        f"{prefix_text}\n\n"
+        "Output format:\n"
+        "Summary: <one sentence>\n\n"
+        "Mind Map:\n"
+        "- <Root>\n"
+        "  - <Key Point>\n"
+        "    - <Sub Point>\n"
+    )
+
+def parse_summary_and_md(output_text: str):
+    try:
+        import re
+        # Capture after 'Summary:' until 'Mind Map:'
+        summary_match = re.search(r"Summary\s*:\s*(.+?)(?:\n\s*\n|\n\s*Mind Map:|$)", output_text, re.DOTALL | re.IGNORECASE)
+        mindmap_match = re.search(r"Mind Map\s*:\s*(.+)$", output_text, re.DOTALL | re.IGNORECASE)
+        summary_val = (summary_match.group(1).strip() if summary_match else output_text.strip().split('\n', 1)[0].strip())
+        mindmap_val = (mindmap_match.group(1).strip() if mindmap_match else "")
+        # Fallback: if mindmap is empty, produce a minimal markdown from the summary
+        if not mindmap_val:
+            root = summary_val.split('.')[0].strip()
+            if not root:
+                root = "Summary"
+            mindmap_val = f"- {root}\n  - Key Points\n    - (derived from summary)"
+        return summary_val, mindmap_val
+    except Exception:
+        return output_text.strip(), f"- {output_text.strip()}"
+
+def parse_mindmap_to_graph(md_text: str, summary_text: str = ""):
+    try:
+        nodes = []
+        links = []
+        stack = []  # list of tuples (depth, node_id)
+        seen = {}
+        for raw in (md_text or '').splitlines():
+            if not raw.strip():
+                continue
+            stripped = raw.lstrip('\t ')
+            if not (stripped.startswith('-') or stripped.startswith('*')):
+                continue
+            indent = len(raw) - len(raw.lstrip(' '))
+            # assume 2-space indentation per level, be tolerant
+            depth = max(0, indent // 2)
+            label = stripped[1:].strip()
+            if not label:
+                continue
+            count = seen.get(label, 0)
+            seen[label] = count + 1
+            node_id = label if count == 0 else f"{label} ({count+1})"
+            nodes.append({"id": node_id, "group": depth, "label": label})
+            while stack and stack[-1][0] >= depth:
+                stack.pop()
+            if stack:
+                links.append({"source": stack[-1][1], "target": node_id, "value": 1})
+            stack.append((depth, node_id))
+        # Fallback: if graph is too sparse, synthesize a minimal one from summary
+        if not nodes:
+            root = (summary_text.split(".")[0] or "Paper").strip() or "Paper"
+            child = "Summary"
+            nodes = [
+                {"id": root, "group": 0, "label": root},
+                {"id": child, "group": 1, "label": (summary_text[:80] + ("…" if len(summary_text) > 80 else "")) or child},
+            ]
+            links = [{"source": root, "target": child, "value": 1}]
+        elif not links and len(nodes) > 1:
+            # connect first as root to others
+            root_id = nodes[0]["id"]
+            links = [{"source": root_id, "target": n["id"], "value": 1} for n in nodes[1:]]
+        return {"nodes": nodes, "links": links}
+    except Exception:
+        root = (summary_text.split(".")[0] or "Paper").strip() or "Paper"
+        return {"nodes": [{"id": root, "group": 0, "label": root}], "links": []}
+
+def summarize_to_mindmap(text: str) -> dict:
+    output_text = (llm_gateway.generate(build_prompt_from_text(text)) or '').strip()
+    summary, mindmap_md = parse_summary_and_md(output_text)
+    return {"summary": summary, "mindmap_md": mindmap_md, "graph": parse_mindmap_to_graph(mindmap_md, summary)}
+
+def document_mindmap(pdf_path: str, regenerate: bool = False) -> dict:
+    """Summary + markdown/graph mind map of the whole document, cached by content hash."""
+    doc_hash = pdf_text.content_hash(pdf_path)
+    with metrics.timed("mindmap_document", doc_size=document_size(doc_hash)) as labels:
+        if not regenerate:
+            cached = mindmap_cache.get(doc_hash, 'document')
+            if cached is not None:
+                labels["cache"] = "hit"
+                return cached
+        labels["cache"] = "miss"
+        # whole paper, map-reduced to fit one prompt
+        with metrics.timed("digest", doc_size=labels["doc_size"]):
+            full_text = document_digest(pdf_path)
+        if not full_text or len(full_text.strip()) < 50:
+            raise ValueError("Unable to extract sufficient text from PDF")
+        result = summarize_to_mindmap(full_text)
+        mindmap_cache.put(doc_hash, 'document', result)
+        return result
+
+# Optionally build both mind maps in the background as soon as a document is loaded
+MINDMAP_PREGENERATE = os.environ.get("MINDMAP_PREGENERATE", "0").lower() in ("1", "true", "yes")
+_mindmap_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mindmap")
+_pregenerating = set()
+_pregenerate_lock = threading.Lock()
+
+def _pregenerate(pdf_path: str, doc_hash: str):
+    try:
+        generate_mindmap_structure(pdf_path)
+        document_mindmap(pdf_path)
+        logging.info(f"🗺️ Mind maps ready for {doc_hash[:12]}")
+    except Exception:
+        logging.exception("Mind map pre-generation failed")
+    finally:
+        with _pregenerate_lock:
+            _pregenerating.discard(doc_hash)
+
+def pregenerate_mindmaps(pdf_path: str, doc_hash: str):
+    with _pregenerate_lock:
+        if doc_hash in _pregenerating:
+            return
+        _pregenerating.add(doc_hash)
+    _mindmap_pool.submit(_pregenerate, pdf_path, doc_hash)
+
+def _wants_regenerate(data: dict) -> bool:
+    value = data.get('regenerate', request.args.get('regenerate'))
+    return str(value).strip().lower() in ('1', 'true', 'yes')
+
 @app.route('/mindmap', methods=['POST'])
 @cross_origin()
 def generate_mindmap_route():
     try:
         data = request.get_json(silent=True) or {}
         scope = (data.get('scope') or 'selection').strip().lower()
-
-        def build_prompt_from_text(prefix_text: str) -> str:
-            return (
-                "You are a research analyst. Perform the following two tasks:\n\n"
-                "First, write a concise, one-sentence summary of the text below.\n\n"
-                "Then, using only the information from your summary, create a simple mind map. The mind map should be in Markdown format with nested bullet points.\n\n"
-                "Text:\n"
-                f"{prefix_text}\n\n"
-                "Output format:\n"
-                "Summary: <one sentence>\n\n"
-                "Mind Map:\n"
-                "- <Root>\n"
-                "  - <Key Point>\n"
-                "    - <Sub Point>\n"
-            )
-
-        def parse_summary_and_md(output_text: str):
-            try:
-                import re
-                # Capture after 'Summary:' until 'Mind Map:'
-                summary_match = re.search(r"Summary\s*:\s*(.+?)(?:\n\s*\n|\n\s*Mind Map:|$)", output_text, re.DOTALL | re.IGNORECASE)
-                mindmap_match = re.search(r"Mind Map\s*:\s*(.+)$", output_text, re.DOTALL | re.IGNORECASE)
-                summary_val = (summary_match.group(1).strip() if summary_match else output_text.strip().split('\n', 1)[0].strip())
-                mindmap_val = (mindmap_match.group(1).strip() if mindmap_match else "")
-                # Fallback: if mindmap is empty, produce a minimal markdown from the summary
-                if not mindmap_val:
-                    root = summary_val.split('.')[0].strip()
-                    if not root:
-                        root = "Summary"
-                    mindmap_val = f"- {root}\n  - Key Points\n    - (derived from summary)"
-                return summary_val, mindmap_val
-            except Exception:
-                return output_text.strip(), f"- {output_text.strip()}"
-
-        def parse_mindmap_to_graph(md_text: str, summary_text: str = ""):
-            try:
-                nodes = []
-                links = []
-                stack = []  # list of tuples (depth, node_id)
-                seen = {}
-                for raw in (md_text or '').splitlines():
-                    if not raw.strip():
-                        continue
-                    stripped = raw.lstrip('\t ')
-                    if not (stripped.startswith('-') or stripped.startswith('*')):
-                        continue
-                    indent = len(raw) - len(raw.lstrip(' '))
-                    # assume 2-space indentation per level, be tolerant
-                    depth = max(0, indent // 2)
-                    label = stripped[1:].strip()
-                    if not label:
-                        continue
-                    count = seen.get(label, 0)
-                    seen[label] = count + 1
-                    node_id = label if count == 0 else f"{label} ({count+1})"
-                    nodes.append({"id": node_id, "group": depth, "label": label})
-                    while stack and stack[-1][0] >= depth:
-                        stack.pop()
-                    if stack:
-                        links.append({"source": stack[-1][1], "target": node_id, "value": 1})
-                    stack.append((depth, node_id))
-                # Fallback: if graph is too sparse, synthesize a minimal one from summary
-                if not nodes:
-                    root = (summary_text.split(".")[0] or "Paper").strip() or "Paper"
-                    child = "Summary"
-                    nodes = [
-                        {"id": root, "group": 0, "label": root},
-                        {"id": child, "group": 1, "label": (summary_text[:80] + ("…" if len(summary_text) > 80 else "")) or child},
-                    ]
-                    links = [{"source": root, "target": child, "value": 1}]
-                elif not links and len(nodes) > 1:
-                    # connect first as root to others
-                    root_id = nodes[0]["id"]
-                    links = [{"source": root_id, "target": n["id"], "value": 1} for n in nodes[1:]]
-                return {"nodes": nodes, "links": links}
-            except Exception:
-                root = (summary_text.split(".")[0] or "Paper").strip() or "Paper"
-                return {"nodes": [{"id": root, "group": 0, "label": root}], "links": []}
-
-        model = genai.GenerativeModel("gemini-2.5-flash-lite")
+        regenerate = _wants_regenerate(data)
 
         if scope == 'document':
-            if current_pdf_path is None:
+            doc = _resolve_document()
+            if doc is None:
                 return jsonify(error="No PDF loaded"), 400
             try:
-                full_text = extract_pdf_text(current_pdf_path)
-                if not full_text or len(full_text.strip()) < 50:
-                    return jsonify(error="Unable to extract sufficient text from PDF"), 500
-            except Exception as e:
-                logging.exception("PDF text extraction failed: %s", e)
-                return jsonify(error="Failed to extract text from PDF"), 500
-
-            prompt = build_prompt_from_text(full_text[:6000])
-            resp = model.generate_content(prompt)
-            output_text = (resp.text or '').strip()
-            summary, mindmap_md = parse_summary_and_md(output_text)
-            graph = parse_mindmap_to_graph(mindmap_md, summary)
-            return jsonify(summary=summary, mindmap_md=mindmap_md, graph=graph)
+                result = document_mindmap(doc["pdf_path"], regenerate=regenerate)
+            except ValueError as e:
+                return jsonify(error=str(e)), 500
+            return jsonify(**result)
 
         # selection flow
         text = (data.get('text') or '').strip()
         if not text:
             return jsonify(error="Missing 'text'"), 400
 
-        prompt = build_prompt_from_text(text[:4000])
-        resp = model.generate_content(prompt)
-        output_text = (resp.text or '').strip()
-        summary, mindmap_md = parse_summary_and_md(output_text)
-        graph = parse_mindmap_to_graph(mindmap_md, summary)
-        return jsonify(summary=summary, mindmap_md=mindmap_md, graph=graph)
+        text = text[:4000]
+        doc = _resolve_document()
+        doc_hash = doc["doc_hash"] if doc else None
+        with metrics.timed("mindmap_selection", doc_size=document_size(doc_hash)) as labels:
+            result = None if regenerate else mindmap_cache.get(doc_hash, 'selection', text)
+            labels["cache"] = "miss" if result is None else "hit"
+            if result is None:
+                result = summarize_to_mindmap(text)
+                mindmap_cache.put(doc_hash, 'selection', result, text)
+        return jsonify(**result)
     except Exception as e:
         logging.exception("/mindmap failed")
         return jsonify(error=str(e)), 500
 
 # ─── ArXiv Search / Log-Cick Routes ────────────────────────────────────────────
+SEARCH_PREFETCH = int(os.environ.get("SEARCH_PREFETCH", "0"))
+SEARCH_PREFETCH_INDEX = os.environ.get("SEARCH_PREFETCH_INDEX", "1").lower() in ("1", "true", "yes")
+
 @app.route("/search", methods=["POST"])
 @cross_origin()
 def search_arxiv():
@@ -336,6 +531,14 @@ def search_arxiv():
     # 1) shorten prompt, 2) run arxiv query
     short_q = generate_short_query(searchTerm)
     results = search_arxiv_papers(short_q)
+
+    # 3) optionally warm the PDF (and index) of the top results so a click opens instantly
+    try:
+        prefetch = int(data.get('prefetch', SEARCH_PREFETCH) or 0)
+    except (TypeError, ValueError):
+        prefetch = 0
+    if prefetch > 0:
+        prefetch_pdfs([r["url"] for r in results[:prefetch]], index=SEARCH_PREFETCH_INDEX)
     return jsonify(results=results, user_prompt=searchTerm)
 
 @app.route("/log-click", methods=["POST"])
@@ -375,142 +578,140 @@ def transcribe_audio():
         # Default to .wav if extension missing or suspiciously long
         if not ext or len(ext) > 5:
             ext = '.wav'
+            safe_name = f"audio{ext}"
 
-        # Save audio file temporarily with preserved/derived extension
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as temp_file:
-            audio_file.save(temp_file.name)
-            temp_audio_path = temp_file.name
-        
-        try:
-            use_google = (engine == 'google') or language.lower().startswith('hi')
-            if use_google and google_speech is not None:
-                # Google Cloud Speech-to-Text for Hindi
-                with open(temp_audio_path, 'rb') as f:
-                    content = f.read()
-                ext = (os.path.splitext(temp_audio_path)[1] or '').lower()
-                if ext == '.webm':
-                    encoding = google_speech.RecognitionConfig.AudioEncoding.WEBM_OPUS
-                elif ext == '.ogg':
-                    encoding = google_speech.RecognitionConfig.AudioEncoding.OGG_OPUS
-                elif ext == '.mp3':
-                    encoding = google_speech.RecognitionConfig.AudioEncoding.MP3
-                else:
-                    encoding = google_speech.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED
-
-                client = google_speech.SpeechClient()
-                audio  = google_speech.RecognitionAudio(content=content)
-                base_config = dict(
-                    encoding=encoding,
-                    language_code='hi-IN',
-                    alternative_language_codes=['hi','en-IN'],
-                    enable_automatic_punctuation=True,
-                    audio_channel_count=1
-                )
-                config = google_speech.RecognitionConfig(**base_config)
-                response = client.recognize(config=config, audio=audio)
-                text_parts = []
-                conf_vals = []
-                for result in response.results:
-                    if result.alternatives:
-                        text_parts.append((result.alternatives[0].transcript or '').strip())
-                        try:
-                            conf_vals.append(float(getattr(result.alternatives[0], 'confidence', 1.0)))
-                        except Exception:
-                            pass
-                transcribed_text = ' '.join([t for t in text_parts if t])
-                confidence = float(sum(conf_vals)/len(conf_vals)) if conf_vals else 1.0
-                if not transcribed_text:
-                    # Fallback attempt with simplified config
-                    fallback_cfg = google_speech.RecognitionConfig(
-                        encoding=google_speech.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED,
-                        language_code='hi',
-                        enable_automatic_punctuation=True
-                    )
-                    try:
-                        response2 = client.recognize(config=fallback_cfg, audio=audio)
-                        text_parts2 = []
-                        conf_vals2 = []
-                        for result in response2.results:
-                            if result.alternatives:
-                                text_parts2.append((result.alternatives[0].transcript or '').strip())
-                                try:
-                                    conf_vals2.append(float(getattr(result.alternatives[0], 'confidence', 1.0)))
-                                except Exception:
-                                    pass
-                        transcribed_text = ' '.join([t for t in text_parts2 if t])
-                        confidence = float(sum(conf_vals2)/len(conf_vals2)) if conf_vals2 else confidence
-                    except Exception as ge:
-                        logging.error(f"Google STT fallback failed: {ge}")
-
-                if not transcribed_text:
-                    return jsonify({
-                        "error": "No clear speech detected. Please try again.",
-                        "text": "",
-                        "language": 'hi-IN',
-                        "confidence": confidence
-                    }), 200
+        # Work on the upload in memory; no temp file round trip
+        content = audio_file.read()
+
+        use_google = (engine == 'google') or language.lower().startswith('hi')
+        if use_google and speech.google_speech is not None:
+            # Google Cloud Speech-to-Text for Hindi (primary and fallback configs race)
+            result = speech.transcribe_google(content, ext)
+            if not result["text"]:
                 return jsonify({
-                    "text": transcribed_text,
-                    "language": 'hi-IN',
-                    "confidence": confidence
+                    "error": "No clear speech detected. Please try again.",
+                    "text": "",
+                    "language": result["language"],
+                    "confidence": result["confidence"]
                 }), 200
-            else:
-                # ElevenLabs default
-                client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
-                with open(temp_audio_path, 'rb') as audio_data:
-                    stt_model = "scribe_v1"
-                    transcription = client.speech_to_text.convert(
-                        model_id=stt_model,
-                        file=audio_data,
-                        language_code=language,
-                        diarize=False,
-                        timestamps_granularity="word"
-                    )
-                transcribed_text = transcription.text if hasattr(transcription, 'text') else str(transcription)
-                if transcribed_text:
-                    transcribed_text = transcribed_text.strip()
-                logging.info(f"Transcription successful: '{transcribed_text}'")
-                if not transcribed_text or len(transcribed_text) < 2:
-                    return jsonify({
-                        "error": "No clear speech detected. Please try speaking more clearly.",
-                        "text": "",
-                        "language": getattr(transcription, 'language_code', language or 'en'),
-                        "confidence": getattr(transcription, 'language_probability', 0.0)
-                    }), 200
+        else:
+            # ElevenLabs default
+            result = speech.transcribe_elevenlabs(content, safe_name, language)
+            logging.info(f"Transcription successful: '{result['text']}'")
+            if len(result["text"]) < 2:
                 return jsonify({
-                    "text": transcribed_text,
-                    "language": getattr(transcription, 'language_code', language or 'en'),
-                    "confidence": getattr(transcription, 'language_probability', 1.0)
+                    "error": "No clear speech detected. Please try speaking more clearly.",
+                    "text": "",
+                    "language": result["language"],
+                    "confidence": result["confidence"]
                 }), 200
-            
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_audio_path)
-            except:
-                pass
-                
+        return jsonify({
+            "text": result["text"],
+            "language": result["language"],
+            "confidence": result["confidence"]
+        }), 200
+
     except Exception as e:
         logging.error(f"Transcription endpoint error: {e}")
         return jsonify(error=f"Server error: {str(e)}"), 500
 
 
-def _translate_text(text: str, target_lang: str) -> str:
-    try:
-        tgt = (target_lang or '').strip().lower()
-        if not text:
-            return ''
-        # Simple translate prompt; model already configured in rag.py import
-        prompt = f"""
+STT_FRAME_BYTES = int(os.environ.get("STT_FRAME_BYTES", "8192"))
+_STREAM_EXTENSIONS = {"webm": ".webm", "ogg": ".ogg", "mpeg": ".mp3", "mp3": ".mp3", "wav": ".wav", "l16": ".raw"}
+
+@app.route("/transcribe-stream", methods=["POST"])
+@cross_origin()
+def transcribe_stream():
+    """
+    Live voice questions. The request body is the audio itself, sent with
+    chunked transfer encoding as it is recorded; frames are forwarded to a
+    streaming recognizer as they arrive. Server-sent events: partial
+    {text}..., final {text}, then (unless ask=0) the answer to the final
+    transcript as on /ask-stream (meta, token..., done) or, for Hindi, as on
+    /ask-hindi-stream — no second client round trip.
+    Query parameters: language (en|hi), engine (google|fake), ask,
+    sample_rate for raw PCM (required for audio/l16 unless sent as its
+    rate= parameter).
+    """
+    language = (request.args.get('language') or 'en').strip() or 'en'
+    engine = (request.args.get('engine') or '').strip().lower() or None
+    ask = (request.args.get('ask') or '1').strip().lower() not in ('0', 'false', 'no')
+    sample_rate = request.args.get('sample_rate', type=int)
+    subtype = (request.mimetype or '').split('/')[-1]
+    ext = _STREAM_EXTENSIONS.get(subtype, '.webm')
+    if ext == '.raw':
+        rate = request.mimetype_params.get('rate', '')
+        sample_rate = sample_rate or (int(rate) if rate.isdigit() else None)
+        if not sample_rate:
+            return jsonify(error="sample_rate is required for audio/l16"), 400
+    doc = _resolve_document() if ask else None
+    body = request.stream   # read from the recognizer's thread, outside the request context
+
+    def frames():
+        while True:
+            frame = body.read(STT_FRAME_BYTES)
+            if not frame:
+                return
+            yield frame
+
+    def events():
+        try:
+            transcript = ''
+            for is_final, text in speech.streaming_transcripts(frames(), language, engine, ext, sample_rate):
+                transcript = text
+                if not is_final:
+                    yield _sse("partial", {"text": text})
+            yield _sse("final", {"text": transcript, "language": language})
+            if not ask or not transcript:
+                return
+            if doc is None:
+                yield _sse("error", {"error": "No PDF loaded"})
+                return
+
+            if language.lower().startswith('hi'):
+                question_en = _translate_text(transcript, 'en')
+                answers = stream_chat_with_doc_bilingual(transcript, question_en, 'Hindi', doc_hash=doc["doc_hash"])
+            else:
+                answers = stream_chat_with_doc(transcript, doc_hash=doc["doc_hash"])
+            for event, payload in answers:
+                if event in ("token", "token_en"):
+                    yield _sse(event, {"text": payload})
+                elif event == "done":
+                    yield _sse("done", {"answer": payload.get("text"), "answer_en": payload.get("text_en"),
+                                        "page": payload.get("page"), "snippet": payload.get("snippet"),
+                                        "anchors": payload.get("anchors")})
+                else:
+                    yield _sse(event, payload)
+        except Exception as e:
+            logging.exception("/transcribe-stream failed")
+            yield _sse("error", {"error": str(e)})
+
+    return _sse_response(events())
+
+
+def _translation_prompt(text: str, target_lang: str) -> str:
+    tgt = (target_lang or '').strip().lower()
+    # Simple translate prompt; model already configured in rag.py import
+    return f"""
 You are a translator. Translate the following text into {tgt}.
 Preserve meaning and tone. Output only the translated text with no notes.
 
 Text:
 {text}
 """
-        model = genai.GenerativeModel("gemini-2.5-flash-lite")
-        resp = model.generate_content(prompt)
-        return (resp.text or '').strip()
+
+
+def _translate_text(text: str, target_lang: str) -> str:
+    try:
+        if not text:
+            return ''
+        cached = translation_cache.get(text, target_lang)
+        if cached is not None:
+            return cached
+        translated = (llm_gateway.generate(_translation_prompt(text, target_lang)) or '').strip()
+        if translated:
+            translation_cache.put(text, target_lang, translated)
+        return translated
     except Exception:
         logging.exception("Translation failed")
         return text
@@ -522,33 +723,89 @@ def ask_hindi():
     question_hi = (data.get('question_hi') or '').strip()
     if not question_hi:
         return jsonify(error="Question cannot be empty"), 400
+    doc = _resolve_document()
+    if doc is None:
+        return jsonify(error="No PDF loaded"), 400
     try:
-        # hi -> en
+        # hi -> en for retrieval (cached), then one call writes both answers
         question_en = _translate_text(question_hi, 'en')
-        ans = chat_with_doc(question_en)
-        if isinstance(ans, dict):
-            answer_en = ans.get('text') or ''
-            page = ans.get('page')
-            snippet = ans.get('snippet')
-            anchors = ans.get('anchors')
-        else:
-            answer_en = str(ans)
-            page = None
-            snippet = None
-            anchors = None
-        # en -> hi
-        answer_hi = _translate_text(answer_en, 'hi')
+        ans = chat_with_doc_bilingual(question_hi, question_en, 'Hindi', doc_hash=doc["doc_hash"])
         return jsonify(
-            answer_hi=answer_hi,
-            answer_en=answer_en,
-            page=page,
-            snippet=snippet,
-            anchors=anchors
+            answer_hi=ans.get('text') or '',
+            answer_en=ans.get('text_en') or '',
+            page=ans.get('page'),
+            snippet=ans.get('snippet'),
+            anchors=ans.get('anchors')
         )
     except Exception as e:
         logging.exception("/ask-hindi failed")
         return jsonify(error=str(e)), 500
 
+@app.route('/ask-hindi-stream', methods=['POST'])
+def ask_hindi_stream():
+    """
+    Server-sent events version of /ask-hindi: meta, token... (Hindi answer),
+    token_en... (English answer), done.
+    """
+    data = request.get_json(silent=True) or {}
+    question_hi = (data.get('question_hi') or '').strip()
+    if not question_hi:
+        return jsonify(error="Question cannot be empty"), 400
+    doc = _resolve_document()
+    if doc is None:
+        return jsonify(error="No PDF loaded"), 400
+
+    def events():
+        try:
+            # hi -> en for retrieval (cached), then one streamed call writes both answers
+            question_en = _translate_text(question_hi, 'en')
+            answer = {}
+            for event, payload in stream_chat_with_doc_bilingual(question_hi, question_en, 'Hindi',
+                                                                 doc_hash=doc["doc_hash"]):
+                if event in ("token", "token_en"):
+                    yield _sse(event, {"text": payload})
+                elif event == "done":
+                    answer = payload
+                else:
+                    yield _sse(event, payload)
+            yield _sse("done", {
+                "answer_hi": answer.get('text') or '',
+                "answer_en": answer.get('text_en') or '',
+                "page": answer.get('page'),
+                "snippet": answer.get('snippet'),
+                "anchors": answer.get('anchors'),
+            })
+        except Exception as e:
+            logging.exception("/ask-hindi-stream failed")
+            yield _sse("error", {"error": str(e)})
+
+    return _sse_response(events())
+
+TTS_OUTPUT_FORMAT = "mp3_22050_32"   # lower bitrate for faster start/playback
+# texts at least this long are synthesized sentence by sentence (pipelined)
+TTS_PIPELINE_MIN_CHARS = int(os.environ.get("TTS_PIPELINE_MIN_CHARS", "600"))
+
+def _elevenlabs():
+    # one client (and HTTP connection pool) for the whole process
+    return speech.elevenlabs_client()
+
+def _timed_audio(stage: str, chunks):
+    # first audio byte and full synthesis of a cache miss
+    started = time.perf_counter()
+    first = True
+    with metrics.timed(stage, cache="miss"):
+        for chunk in chunks:
+            if first:
+                metrics.observe(f"{stage}_first_byte", time.perf_counter() - started, cache="miss")
+                first = False
+            yield chunk
+
+def _send_cached_audio(path: str, key: str):
+    # conditional=True answers If-None-Match with 304 and Range with 206
+    response = send_file(path, mimetype="audio/mpeg", conditional=True, etag=key)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
 @app.route("/tts", methods=["POST", "GET"])
 @cross_origin()
 def synthesize_tts():
@@ -559,6 +816,7 @@ def synthesize_tts():
                         os.environ.get("ELEVENLABS_VOICE_ID") or
                         "21m00Tcm4TlvDq8ikWAM")
             model_id = (request.args.get('model_id') or 'eleven_multilingual_v2')
+            pipeline = request.args.get('pipeline')
         else:
             data = request.get_json(silent=True) or {}
             text = (data.get('text') or '').strip()
@@ -566,30 +824,62 @@ def synthesize_tts():
                         os.environ.get("ELEVENLABS_VOICE_ID") or
                         "21m00Tcm4TlvDq8ikWAM")  # Default: Rachel
             model_id = (data.get('model_id') or 'eleven_multilingual_v2')
+            pipeline = data.get('pipeline')
 
         if not text:
             return jsonify(error="Missing 'text'"), 400
 
-        client = ElevenLabs(api_key=ELEVENLABS_API_KEY)
+        key = tts_key(text, voice_id, model_id, TTS_OUTPUT_FORMAT)
+        cached = tts_cache.get(key)
+        if cached:
+            metrics.observe("tts", time.perf_counter() - g.request_started, cache="hit")
+            response = _send_cached_audio(cached, key)
+            response.headers["X-Voice-Id"] = voice_id
+            response.headers["X-Cache"] = "hit"
+            return response
 
-        try:
-            audio_stream = client.text_to_speech.convert(
+        if pipeline is None:
+            pipeline = len(text) >= TTS_PIPELINE_MIN_CHARS
+        else:
+            pipeline = str(pipeline).strip().lower() in ('1', 'true', 'yes')
+
+        def synthesize(segment, previous_text=None, next_text=None):
+            # neighbouring text keeps intonation continuous across pipelined segments
+            context = {k: v for k, v in (("previous_text", previous_text), ("next_text", next_text)) if v}
+            return _elevenlabs().text_to_speech.convert(
                 voice_id=voice_id,
                 model_id=model_id,
-                text=text,
-                # lower bitrate for faster start/playback
-                output_format="mp3_22050_32",
+                text=segment,
+                output_format=TTS_OUTPUT_FORMAT,
+                **context,
             )
 
-            def generate():
-                for chunk in audio_stream:
-                    yield chunk
+        try:
+            segments = split_sentences(text) if pipeline else [text]
+            if len(segments) > 1:
+                audio_stream = pipelined_audio(segments, synthesize)
+            else:
+                audio_stream = synthesize(text)
+
+            if request.range is not None:
+                # a byte range needs the whole file: synthesize it fully, then serve the range
+                with metrics.timed("tts", cache="miss"):
+                    path = tts_cache.store(key, audio_stream)
+                response = _send_cached_audio(path, key)
+                response.headers["X-Voice-Id"] = voice_id
+                response.headers["X-Cache"] = "miss"
+                return response
 
+            # stream to the client while writing the cache entry
             headers = {
-                "Cache-Control": "no-store",
+                "Cache-Control": "public, max-age=31536000, immutable",
+                "ETag": f'"{key}"',
                 "X-Voice-Id": voice_id,
+                "X-Cache": "miss",
             }
-            return Response(generate(), mimetype="audio/mpeg", headers=headers)
+            stage = "tts_pipelined" if len(segments) > 1 else "tts"
+            return Response(_timed_audio(stage, tts_cache.tee(key, audio_stream)),
+                            mimetype="audio/mpeg", headers=headers)
 
         except Exception as e:
             logging.error(f"ElevenLabs TTS error: {e}")
@@ -605,19 +895,20 @@ def generate_mindmap_json():
     """Generate a mind map structure from the research paper"""
     try:
         data = request.get_json(silent=True) or {}
-        pdf_url = data.get('pdfUrl', current_pdf_path)
+        doc = _resolve_document()
+        pdf_path = doc["pdf_path"] if doc else None
         
-        logging.info(f"Mind map generation requested. PDF path: {current_pdf_path}")
-        logging.info(f"PDF exists: {os.path.exists(current_pdf_path) if current_pdf_path else False}")
+        logging.info(f"Mind map generation requested. PDF path: {pdf_path}")
+        logging.info(f"PDF exists: {os.path.exists(pdf_path) if pdf_path else False}")
         
-        if not current_pdf_path:
+        if not pdf_path:
             return jsonify(error="No PDF loaded. Please load a PDF first."), 400
             
-        if not os.path.exists(current_pdf_path):
+        if not os.path.exists(pdf_path):
             return jsonify(error="PDF file not found. Please reload the PDF."), 400
         
-        # Generate mind map structure using AI
-        mindmap_data = generate_mindmap_structure(current_pdf_path)
+        # Generate mind map structure using AI (or reuse the cached one)
+        mindmap_data = generate_mindmap_structure(pdf_path, regenerate=_wants_regenerate(data))
         
         logging.info(f"Mind map generated successfully with {len(mindmap_data.get('children', []))} main nodes")
         return jsonify(mindMap=mindmap_data), 200
@@ -628,23 +919,27 @@ def generate_mindmap_json():
         logging.error(f"Full traceback: {traceback.format_exc()}")
         return jsonify(error=f"Failed to generate mind map: {str(e)}"), 500
 
-def generate_mindmap_structure(pdf_path):
-    """Generate a hierarchical mind map structure from PDF content"""
+def generate_mindmap_structure(pdf_path, regenerate=False):
+    """Generate a hierarchical mind map structure from PDF content (cached per document)"""
     try:
-        import fitz  # PyMuPDF
         import json
         
+        doc_hash = pdf_text.content_hash(pdf_path)
+        started = time.perf_counter()
+        size = document_size(doc_hash)
+        if not regenerate:
+            cached = mindmap_cache.get(doc_hash, 'structure')
+            if cached is not None:
+                metrics.observe("mindmap_structure", time.perf_counter() - started, size, "hit")
+                return cached
+        
         logging.info(f"Extracting text from PDF: {pdf_path}")
         
-        # Extract text from PDF
-        doc = fitz.open(pdf_path)
-        full_text = ""
-        for page_num, page in enumerate(doc):
-            page_text = page.get_text()
-            full_text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-        doc.close()
+        # Whole paper: page text when it fits, otherwise map-reduced part summaries
+        with metrics.timed("digest", doc_size=size):
+            full_text = document_digest(pdf_path)
         
-        logging.info(f"Extracted {len(full_text)} characters from PDF")
+        logging.info(f"Mind map input is {len(full_text)} characters")
         
         if len(full_text.strip()) < 100:
             logging.warning("PDF text extraction resulted in very little text, using fallback")
@@ -795,20 +1090,19 @@ def generate_mindmap_structure(pdf_path):
         IMPORTANT: Each node MUST have detailed bulletPoints (at least 3-4 points) that explain the concept in detail.
         Focus on extracting specific, concrete details from the paper content.
         
-        Paper content (first 10000 characters):
-        {full_text[:10000]}
+        Paper content (page text or per-section summaries, covering the whole paper):
+        {full_text}
         """
         
         logging.info("Sending prompt to AI model for mind map generation")
-        model = genai.GenerativeModel("gemini-2.5-flash-lite")
-        response = model.generate_content(prompt)
+        raw_text = llm_gateway.generate(prompt)
         
-        logging.info(f"AI response received: {len(response.text)} characters")
+        logging.info(f"AI response received: {len(raw_text)} characters")
         
         # Parse the JSON response
         try:
             # Clean the response text to extract JSON
-            response_text = response.text.strip()
+            response_text = raw_text.strip()
             if response_text.startswith('```json'):
                 response_text = response_text[7:]
             if response_text.endswith('```'):
@@ -817,10 +1111,12 @@ def generate_mindmap_structure(pdf_path):
             
             mindmap_data = json.loads(response_text)
             logging.info("Successfully parsed AI-generated mind map")
+            mindmap_cache.put(doc_hash, 'structure', mindmap_data)
+            metrics.observe("mindmap_structure", time.perf_counter() - started, size, "miss")
             return mindmap_data
         except json.JSONDecodeError as e:
             logging.error(f"JSON parsing failed: {e}")
-            logging.error(f"Response text: {response.text[:500]}...")
+            logging.error(f"Response text: {raw_text[:500]}...")
             # Fallback structure if JSON parsing fails
             return create_fallback_mindmap(full_text)
             
@@ -984,28 +1280,26 @@ def upload_pdf():
         if not file.filename.lower().endswith('.pdf'):
             return jsonify(error="File must be a PDF"), 400
         
-        # Create uploads directory if it doesn't exist
-        upload_dir = os.path.join(os.getcwd(), 'uploads')
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Save the uploaded file
+        # Store the upload in the document cache (deduplicated by content)
         filename = secure_filename(file.filename)
-        file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
-        
-        # Update global PDF path and reload model
-        global current_pdf_path, current_pdf_link
-        current_pdf_path = file_path
-        current_pdf_link = f"file://{file_path}"
+        file_path = pdf_cache.add(file.stream)
         
-        # Reload RAG model with new PDF
-        reload_rag_model(current_pdf_path)
+        # Reload RAG model with new PDF and make it this session's document
+        progressive = (request.form.get('progressive') or '').strip().lower() in ('1', 'true', 'yes')
+        session_id = _request_session_id()
+        doc_hash = reload_rag_model(file_path, progressive=progressive)
+        sessions.bind(session_id, doc_hash, file_path, f"file://{file_path}")
+        if MINDMAP_PREGENERATE or (request.form.get('pregenerate') or '').strip().lower() in ('1', 'true', 'yes'):
+            pregenerate_mindmaps(file_path, doc_hash)
         
         logging.info(f"✅ PDF uploaded and processed: {file_path}")
         return jsonify({
             "message": "PDF uploaded and processed successfully",
             "filename": filename,
-            "path": file_path
+            "path": file_path,
+            "document": doc_hash,
+            "session_id": session_id,
+            "progress": get_ingest_progress().get(doc_hash)
         }), 200
         
     except Exception as e:
@@ -1016,34 +1310,36 @@ def upload_pdf():
 @cross_origin()
 def test_mindmap():
     """Test endpoint to check mind map generation"""
+    pdf_path = None
     try:
-        if not current_pdf_path:
+        doc = _resolve_document()
+        pdf_path = doc["pdf_path"] if doc else None
+        if not pdf_path:
             return jsonify({
                 "status": "error",
                 "message": "No PDF loaded",
-                "pdf_path": current_pdf_path,
+                "pdf_path": pdf_path,
                 "pdf_exists": False
             }), 400
         
-        pdf_exists = os.path.exists(current_pdf_path)
+        pdf_exists = os.path.exists(pdf_path)
         return jsonify({
             "status": "success",
             "message": "PDF status check",
-            "pdf_path": current_pdf_path,
+            "pdf_path": pdf_path,
             "pdf_exists": pdf_exists,
-            "model_loading": model_loading
+            "model_loading": sessions.is_loading(_request_session_id())
         }), 200
         
     except Exception as e:
         return jsonify({
             "status": "error",
             "message": str(e),
-            "pdf_path": current_pdf_path
+            "pdf_path": pdf_path
         }), 500
 
 # ─── Startup ──────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-      start_cleanup_thread()
       port = int(os.environ.get("PORT", 5001))
       app.run(host="0.0.0.0", port=port)
  
\ No newline at end of file
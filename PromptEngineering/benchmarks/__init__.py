@@ -0,0 +1,8 @@
+# benchmarks/__init__.py
+"""Offline performance benchmarks for the backend.
+
+Nothing here talks to Gemini, ElevenLabs, Google Speech or arXiv: fakes.py
+stands in for them with configurable latency. Run from PromptEngineering/:
+
+    python -m benchmarks.run --out bench.json
+"""
@@ -0,0 +1,277 @@
+# benchmarks/fakes.py
+"""Local stand-ins for Gemini, ElevenLabs, Google Speech and arXiv.
+
+install() patches the upstream clients in place so that the real code
+paths (embedding batches, the LLM gateway, caches, pipelining) run
+unchanged against deterministic responses with a configurable latency:
+
+    from benchmarks import fakes
+    fakes.install(fakes.Latency(generate=0.4, token=0.02))
+
+Embeddings are hashed bag-of-words vectors, so retrieval still ranks the
+passages that share words with the question. Generated text is shaped by
+the prompt (mind map JSON, "Summary:/Mind Map:" markdown, bilingual
+answers, translations) so the parsers downstream see realistic output.
+"""
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+
+import google.generativeai as genai
+
+EMBED_DIM = 768
+_WORD_CHARS = str.maketrans({c: " " for c in "\n\t.,;:!?()[]{}\"'`*#|/\\<>="})
+
+
+class Latency:
+    """Simulated upstream latencies in seconds; ``jitter`` is a +/- fraction applied to each."""
+
+    def __init__(self, embed: float = 0.05, embed_item: float = 0.002, generate: float = 0.4,
+                 token: float = 0.02, tts: float = 0.25, tts_chunk: float = 0.01, stt: float = 0.3,
+                 search: float = 0.5, jitter: float = 0.2, seed: int = 7):
+        self.embed = embed
+        self.embed_item = embed_item
+        self.generate = generate
+        self.token = token
+        self.tts = tts
+        self.tts_chunk = tts_chunk
+        self.stt = stt
+        self.search = search
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self._lock:
+            factor = 1 + self._random.uniform(-self.jitter, self.jitter)
+        time.sleep(seconds * factor)
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+
+calls = {"embed": 0, "embed_items": 0, "generate": 0, "tts": 0, "stt": 0, "search": 0}
+_calls_lock = threading.Lock()
+
+
+def _count(**deltas) -> None:
+    with _calls_lock:
+        for key, value in deltas.items():
+            calls[key] += value
+
+
+def _words(text: str) -> list:
+    return [w for w in str(text).lower().translate(_WORD_CHARS).split() if len(w) > 2]
+
+
+def embed_vector(text: str) -> list:
+    """Hashed bag-of-words embedding, L2-normalized."""
+    vec = [0.0] * EMBED_DIM
+    for word in _words(text):
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=4).digest(), "little")
+        vec[h % EMBED_DIM] += 1.0 if h & 1 << 31 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+# ── Gemini ────────────────────────────────────────────────────────────────────
+def _section(prompt: str, marker: str) -> str:
+    _, _, rest = prompt.partition(marker)
+    return rest
+
+
+def _answer_for(prompt: str) -> str:
+    from rag import BILINGUAL_SEPARATOR
+
+    context = _section(prompt, "Context:") or _section(prompt, "Passage:") or prompt
+    words = _words(context)[:40] or ["the", "document"]
+    sentence = "Based on the document, " + " ".join(words[:18]) + ". It also covers " + " ".join(words[18:36]) + "."
+    if "Return ONLY a valid JSON" in prompt:
+        children = [{
+            "id": f"section_{i}", "title": " ".join(words[i * 3:i * 3 + 3]).title() or f"Section {i}",
+            "description": sentence, "importance": round(0.9 - i * 0.1, 2), "color": "#0891b2",
+            "bulletPoints": words[i * 4:i * 4 + 4], "keyPoints": words[i:i + 2], "connections": [],
+        } for i in range(6)]
+        return json.dumps({"id": "root", "title": "Research Paper", "description": sentence,
+                           "importance": 1.0, "color": "#1e40af", "bulletPoints": words[:3],
+                           "keyPoints": words[3:5], "connections": [], "children": children})
+    if "Mind Map:" in prompt:
+        lines = ["- " + " ".join(words[:3]).title()]
+        for i in range(1, 5):
+            lines.append("  - " + " ".join(words[i * 4:i * 4 + 2]).title())
+            lines.append("    - " + " ".join(words[i * 4 + 2:i * 4 + 4]))
+        return f"Summary: {sentence}\n\nMind Map:\n" + "\n".join(lines)
+    if "You are a translator" in prompt:
+        return " ".join(_section(prompt, "Text:").split()) or "translated"
+    if BILINGUAL_SEPARATOR in prompt:
+        return f"दस्तावेज़ के अनुसार, {' '.join(words[:18])}।\n{BILINGUAL_SEPARATOR}\n{sentence}"
+    if "Contextual meaning" in prompt or "Operational Context" in prompt:
+        return f"**Operational Context**\n{sentence}\n\n**Other Use-cases**\n{sentence}"
+    return sentence
+
+
+class _Usage:
+    def __init__(self, prompt: str, text: str):
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+
+
+class _Chunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Response:
+    def __init__(self, prompt: str, text: str, latency: Latency):
+        self.text = text
+        self.usage_metadata = _Usage(prompt, text)
+        self._latency = latency
+
+    def __iter__(self):
+        words = self.text.split(" ")
+        for i in range(0, len(words), 4):
+            self._latency.sleep(self._latency.token)
+            yield _Chunk(" ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else ""))
+
+
+class FakeGenerativeModel:
+    latency = Latency()
+
+    def __init__(self, model_name: str = None, generation_config=None, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, prompt, stream: bool = False, **kwargs):
+        prompt = prompt if isinstance(prompt, str) else str(prompt)
+        _count(generate=1)
+        self.latency.sleep(self.latency.generate)
+        return _Response(prompt, _answer_for(prompt), self.latency)
+
+
+def _fake_embed_content(model=None, content=None, **kwargs):
+    latency = FakeGenerativeModel.latency
+    items = content if isinstance(content, list) else [content]
+    _count(embed=1, embed_items=len(items))
+    latency.sleep(latency.embed + latency.embed_item * len(items))
+    if isinstance(content, list):
+        return {"embedding": [embed_vector(t) for t in items]}
+    return {"embedding": embed_vector(content)}
+
+
+# ── ElevenLabs / Google Speech ────────────────────────────────────────────────
+class _TextToSpeech:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def convert(self, text: str = "", **kwargs):
+        _count(tts=1)
+        self.latency.sleep(self.latency.tts)
+        # about 2 KB of "audio" per 100 characters, in 1 KB chunks
+        payload = hashlib.sha256(text.encode("utf-8")).digest() * 32
+        for _ in range(max(1, len(text) // 50)):
+            self.latency.sleep(self.latency.tts_chunk)
+            yield payload
+
+
+class _Transcript:
+    def __init__(self, text: str, language: str):
+        self.text = text
+        self.language_code = language
+        self.language_probability = 0.95
+
+
+class _SpeechToText:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def convert(self, file=None, language_code: str = "en", **kwargs):
+        _count(stt=1)
+        self.latency.sleep(self.latency.stt)
+        content = file[1] if isinstance(file, tuple) else b""
+        return _Transcript(content.decode("utf-8", errors="ignore").strip() or "what is this paper about",
+                           language_code or "en")
+
+
+class FakeElevenLabs:
+    def __init__(self, latency: Latency):
+        self.text_to_speech = _TextToSpeech(latency)
+        self.speech_to_text = _SpeechToText(latency)
+
+
+class _Alternative:
+    def __init__(self, text: str):
+        self.transcript = text
+        self.confidence = 0.9
+
+
+class _Result:
+    def __init__(self, text: str):
+        self.alternatives = [_Alternative(text)]
+        self.is_final = True
+
+
+class _RecognizeResponse:
+    def __init__(self, text: str):
+        self.results = [_Result(text)] if text else []
+
+
+class FakeGoogleSpeech:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    def recognize(self, config=None, audio=None):
+        _count(stt=1)
+        self.latency.sleep(self.latency.stt)
+        content = getattr(audio, "content", b"") or b""
+        return _RecognizeResponse(content.decode("utf-8", errors="ignore").strip() or "यह पेपर किस बारे में है")
+
+
+# ── arXiv ─────────────────────────────────────────────────────────────────────
+class _Paper:
+    def __init__(self, title: str, pdf_url: str):
+        self.title = title
+        self.pdf_url = pdf_url
+
+
+class FakeArxivClient:
+    """Yields ``page_size`` papers whose pdf_url cycles through ``pdf_urls``."""
+
+    def __init__(self, latency: Latency, pdf_urls=()):
+        self.latency = latency
+        self.pdf_urls = list(pdf_urls) or ["http://127.0.0.1:9/paper.pdf"]
+        self.page_size = 5
+
+    def results(self, search):
+        _count(search=1)
+        self.latency.sleep(self.latency.search)
+        query = getattr(search, "query", "") or ""
+        for i in range(getattr(search, "max_results", None) or self.page_size):
+            yield _Paper(f"{query.title()} — study {i + 1}", self.pdf_urls[i % len(self.pdf_urls)])
+
+
+def install(latency: Latency = None, pdf_urls=()) -> Latency:
+    """Route every upstream call of this process to the fakes; returns the latency profile in use."""
+    import llm_gateway
+    import speech
+    import Search_Papers_Arvix
+
+    latency = latency or Latency()
+    FakeGenerativeModel.latency = latency
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.embed_content = _fake_embed_content
+    with llm_gateway._lock:
+        llm_gateway._models.clear()
+    with speech._lock:
+        speech._clients["elevenlabs"] = FakeElevenLabs(latency)
+        speech._clients["google"] = FakeGoogleSpeech(latency)
+    Search_Papers_Arvix._client = FakeArxivClient(latency, pdf_urls)
+    return latency
+
+
+def call_counts() -> dict:
+    with _calls_lock:
+        return dict(calls)
@@ -0,0 +1,306 @@
+# benchmarks/load.py
+"""
+Concurrent load test of the Flask API under classroom-sized bursts.
+
+The app is served in-process by a threaded WSGI server, with every upstream
+(Gemini, ElevenLabs, Google Speech, arXiv) replaced by the local fakes, and
+the sample PDFs in uploads/ are served over HTTP as the "arXiv" papers so
+that /update-pdf downloads them like it would in production. Virtual users
+run scenario scripts over real HTTP; the number of users is stepped up and
+throughput, error rate and latency percentiles are reported per endpoint
+for every step.
+
+    cd PromptEngineering
+    python -m benchmarks.load --concurrency 1,8,32 --duration 20 --out load.json
+
+Scenarios (weights set with --mix reader=6,mindmap=2,voice=2):
+  reader   search -> load a PDF -> several /ask (one streamed) -> selection lookups
+  mindmap  load a PDF -> /generate-mindmap -> document and selection mind maps
+  voice    load a PDF -> /transcribe -> /ask -> /tts of the answer
+"""
+import os
+import sys
+import glob
+import time
+import uuid
+import random
+import logging
+import argparse
+import threading
+from urllib.parse import quote
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import requests
+
+from benchmarks import report
+from benchmarks.run import add_common_args, install_fakes, run_offline
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UPLOADS = os.path.join(HERE, "uploads")
+
+TOPICS = ["transformer attention", "graph neural networks", "credit scoring models",
+          "reinforcement learning", "speech recognition", "recommendation letters"]
+# Asked by many students at once; the rest are unique to one student
+POPULAR_QUESTIONS = ["What is this document about?", "What is the main contribution?",
+                     "Who is the author?", "What are the key results?", "Summarize the conclusion."]
+PHRASES = ["data", "analysis", "experience", "research", "credit score", "the journey"]
+
+
+class EndpointStats:
+    """Per-endpoint latencies and errors of requests started during one step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}   # endpoint -> [seconds]
+        self.errors = {}      # endpoint -> count
+        self.scenarios = {}   # scenario -> completed runs
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def completed(self, scenario: str) -> None:
+        with self._lock:
+            self.scenarios[scenario] = self.scenarios.get(scenario, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        with self._lock:
+            endpoints = {}
+            for endpoint, latencies in sorted(self.latencies.items()):
+                errors = self.errors.get(endpoint, 0)
+                endpoints[endpoint] = dict(
+                    report.latency_summary(latencies),
+                    errors=errors,
+                    error_rate=round(errors / len(latencies), 4),
+                    throughput_rps=round(len(latencies) / elapsed, 2),
+                )
+            total = sum(len(v) for v in self.latencies.values())
+            errors = sum(self.errors.values())
+            everything = [s for v in self.latencies.values() for s in v]
+            return {
+                "requests": total,
+                "errors": errors,
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "throughput_rps": round(total / elapsed, 2),
+                "latency": report.latency_summary(everything),
+                "endpoints": endpoints,
+                "scenarios": dict(self.scenarios),
+            }
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, index: int, stats: EndpointStats, deadline: float,
+                 rng: random.Random, timeout: float):
+        self.base_url = base_url
+        self.index = index
+        self.stats = stats
+        self.deadline = deadline
+        self.rng = rng
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.session_id = f"load-{index}-{uuid.uuid4().hex[:8]}"
+        self.loaded = False
+        self.asked = 0
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def call(self, method: str, path: str, **kwargs):
+        """Timed request; None once the step is over or when the request failed."""
+        if self.expired():
+            return None
+        headers = dict(kwargs.pop("headers", {}), **{"X-Session-Id": self.session_id})
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.http.request(method, self.base_url + path, headers=headers,
+                                         timeout=self.timeout, **kwargs)
+            body = response.content
+            ok = response.status_code < 400 and b"event: error" not in body
+        except requests.RequestException:
+            ok = False
+        self.stats.record(path, time.perf_counter() - started, ok)
+        return response if ok else None
+
+    def question(self) -> str:
+        self.asked += 1
+        if self.rng.random() < 0.5:
+            return self.rng.choice(POPULAR_QUESTIONS)
+        return f"What does the document say about {self.rng.choice(PHRASES)} (student {self.index}, #{self.asked})?"
+
+    def load_paper(self) -> bool:
+        if self.loaded:
+            return True
+        found = self.call("POST", "/search", json={"searchTerm": self.rng.choice(TOPICS)})
+        results = found.json().get("results") if found is not None else None
+        if not results:
+            return False
+        paper = self.rng.choice(results)
+        self.loaded = self.call("POST", "/update-pdf", json={"link": paper["url"]}) is not None
+        return self.loaded
+
+
+def reader(user: VirtualUser) -> None:
+    user.loaded = False   # a reader opens a (possibly different) paper every time
+    if not user.load_paper():
+        return
+    for _ in range(user.rng.randint(3, 6)):
+        user.call("POST", "/ask", json={"question": user.question()})
+    user.call("POST", "/ask-stream", json={"question": user.question()})
+    for _ in range(2):
+        user.call("POST", "/process-selection", json={"text": user.rng.choice(PHRASES)})
+
+
+def mindmap(user: VirtualUser) -> None:
+    if not user.load_paper():
+        return
+    user.call("POST", "/generate-mindmap", json={})
+    user.call("POST", "/mindmap", json={"scope": "document"})
+    selection = " ".join(user.rng.choice(PHRASES) for _ in range(40))
+    user.call("POST", "/mindmap", json={"text": selection})
+
+
+def voice(user: VirtualUser) -> None:
+    if not user.load_paper():
+        return
+    question = user.question()
+    # the fake recognizers return the uploaded bytes as the transcript
+    heard = user.call("POST", "/transcribe", files={"audio": ("q.webm", question.encode("utf-8"))},
+                      data={"language": "en"})
+    text = (heard.json().get("text") if heard is not None else None) or question
+    answer = user.call("POST", "/ask", json={"question": text})
+    spoken = (answer.json().get("answer") if answer is not None else None) or text
+    user.call("POST", "/tts", json={"text": spoken})
+
+
+SCENARIOS = {"reader": reader, "mindmap": mindmap, "voice": voice}
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _user_loop(user: VirtualUser, mix: dict) -> None:
+    names, weights = list(mix), list(mix.values())
+    while not user.expired():
+        name = user.rng.choices(names, weights)[0]
+        try:
+            SCENARIOS[name](user)
+        except Exception:
+            logging.exception(f"Scenario {name} crashed")
+            continue
+        if not user.expired():
+            user.stats.completed(name)
+
+
+def run_step(base_url: str, concurrency: int, duration: float, mix: dict, seed: int, timeout: float) -> dict:
+    stats = EndpointStats()
+    deadline = time.monotonic() + duration
+    users = [VirtualUser(base_url, i, stats, deadline, random.Random(seed * 1000 + i), timeout)
+             for i in range(concurrency)]
+    threads = [threading.Thread(target=_user_loop, args=(u, mix), daemon=True) for u in users]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # requests in flight at the deadline are waited for, so use the real elapsed time
+    elapsed = time.perf_counter() - started
+    return dict(concurrency=concurrency, duration_s=round(elapsed, 2), **stats.summary(elapsed))
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_papers(directory: str):
+    """HTTP server for the sample PDFs; returns (server, [pdf urls])."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(directory, "*.pdf")))
+    return server, [f"http://127.0.0.1:{port}/{quote(name)}" for name in names]
+
+
+def serve_app(flask_app):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def print_step(step: dict) -> None:
+    print(f"\n── {step['concurrency']} users: {step['requests']} requests, "
+          f"{step['throughput_rps']} req/s, {100 * step['error_rate']:.1f}% errors", file=sys.stderr)
+    print(f"{'endpoint':<22}{'count':>7}{'req/s':>8}{'err%':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+          file=sys.stderr)
+    for endpoint, s in step["endpoints"].items():
+        print(f"{endpoint:<22}{s['count']:>7}{s['throughput_rps']:>8}{100 * s['error_rate']:>7.1f}"
+              f"{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}", file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", default="1,4,16,32", help="comma-separated user counts, one step each")
+    parser.add_argument("--duration", type=float, default=20, help="seconds per step")
+    parser.add_argument("--mix", default="reader=6,mindmap=2,voice=2", help="scenario weights")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    add_common_args(parser)
+    return parser.parse_args(argv)
+
+
+def run(args) -> dict:
+    from benchmarks import fakes
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    mix = parse_mix(args.mix)
+    papers, pdf_urls = serve_papers(UPLOADS)
+    latency = install_fakes(args, pdf_urls=pdf_urls)
+    import app as app_module
+
+    server, base_url = serve_app(app_module.app)
+    try:
+        steps = []
+        for concurrency in levels:
+            logging.warning(f"🚦 {concurrency} concurrent users for {args.duration:g}s")
+            step = run_step(base_url, concurrency, args.duration, mix, args.seed, args.timeout)
+            print_step(step)
+            steps.append(step)
+        health = requests.get(base_url + "/health", timeout=args.timeout).json()
+    finally:
+        server.shutdown()
+        papers.shutdown()
+    return {
+        "schema": 1,
+        "benchmark": "load",
+        "environment": report.environment(),
+        "config": {"concurrency": levels, "duration_s": args.duration, "mix": mix,
+                   "papers": [u.rsplit("/", 1)[-1] for u in pdf_urls], "latency": latency.as_dict()},
+        "metrics": {
+            "steps": {str(step["concurrency"]): step for step in steps},
+            "peak_rss_mb": report.peak_rss_mb(),
+        },
+        "server": {key: health.get(key) for key in ("llm", "answer_cache", "pdf_cache", "sessions")},
+        "upstream_calls": fakes.call_counts(),
+    }
+
+
+def main(argv=None) -> int:
+    return run_offline(parse_args(argv), run, "woomai-load-")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# benchmarks/report.py
+"""Shared helpers for benchmark output: latency summaries, peak RSS, run metadata and comparison."""
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+
+import metrics
+
+
+def latency_summary(seconds: list) -> dict:
+    """metrics.latency_summary under the benchmark's keys (count, mean_ms, p50_ms, ...)."""
+    summary = metrics.latency_summary(seconds, digits=2)
+    return {"count": summary.pop("count"), "mean_ms": summary.pop("avg"),
+            **{f"{key}_ms": value for key, value in summary.items()}}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def flatten(data, prefix: str = "") -> dict:
+    """{"a": {"b": 1}} -> {"a.b": 1}, keeping numbers only."""
+    out = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            out.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        out[prefix[:-1]] = data
+    return out
+
+
+def write(result: dict, path: str = None) -> None:
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def compare(baseline_path: str, result: dict, key: str = "metrics") -> list:
+    """(name, baseline, current, change %) for every numeric metric present in both runs."""
+    with open(baseline_path, encoding="utf-8") as f:
+        before = flatten(json.load(f).get(key, {}))
+    after = flatten(result.get(key, {}))
+    rows = []
+    for name in sorted(set(before) & set(after)):
+        old, new = before[name], after[name]
+        change = round(100 * (new - old) / old, 1) if old else None
+        rows.append((name, old, new, change))
+    return rows
+
+
+def print_comparison(rows: list) -> None:
+    width = max((len(name) for name, *_ in rows), default=10)
+    for name, old, new, change in rows:
+        delta = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"{name:<{width}}  {old:>12}  {new:>12}  {delta:>8}", file=sys.stderr)
@@ -0,0 +1,292 @@
+# benchmarks/run.py
+"""
+Offline benchmark of ingestion, question answering, mind maps and speech.
+
+Runs the real app against the local fakes (benchmarks/fakes.py), so no API
+keys or network are needed, over the sample PDFs in uploads/. Results are
+written as JSON; pass --baseline with an earlier result file to print the
+change of every metric.
+
+    cd PromptEngineering
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --generate-latency 0.8 --baseline bench.json
+
+The default latency profile roughly matches Gemini flash-lite and
+ElevenLabs from a Cloud Run region; --latency-scale 0 measures the local
+cost alone.
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import contextlib
+
+from benchmarks import report
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PDFS = sorted(glob.glob(os.path.join(HERE, "uploads", "*.pdf")))
+LONG_TTS_TEXT = " ".join(
+    f"Sentence {i} of the answer explains one more detail of the paper's method and results." for i in range(12)
+)
+
+
+def add_common_args(parser) -> None:
+    """Output, cache and latency options shared by the offline benchmarks (run.py, load.py)."""
+    parser.add_argument("--out", help="write the JSON result here instead of stdout")
+    parser.add_argument("--baseline", help="earlier result file to compare against (printed to stderr)")
+    parser.add_argument("--cache-dir", help="CACHE_DIR for the run (default: a fresh temporary directory)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every simulated latency")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--generate-latency", type=float, default=0.4)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--tts-latency", type=float, default=0.25)
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pdf", action="append", help="PDF to benchmark (repeatable; default: uploads/*.pdf)")
+    parser.add_argument("--questions", type=int, default=20, help="distinct /ask questions per document")
+    add_common_args(parser)
+    return parser.parse_args(argv)
+
+
+def latency_from_args(args):
+    from benchmarks.fakes import Latency
+
+    scale = args.latency_scale
+    return Latency(embed=args.embed_latency * scale, embed_item=0.002 * scale,
+                   generate=args.generate_latency * scale, token=args.token_latency * scale,
+                   tts=args.tts_latency * scale, tts_chunk=0.01 * scale, stt=args.stt_latency * scale,
+                   search=0.5 * scale, jitter=args.jitter)
+
+
+def install_fakes(args, pdf_urls=()):
+    """Route every upstream call to the local fakes with the latency profile from ``args``."""
+    from benchmarks import fakes
+
+    return fakes.install(latency_from_args(args), pdf_urls=pdf_urls)
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def _drop_text_cache() -> None:
+    import pdf_text
+
+    with pdf_text._lock:
+        pdf_text._cache.clear()
+
+
+def _questions(pages: list, count: int) -> list:
+    """Distinct questions built from word pairs that occur in the document."""
+    words = [w for w in " ".join(pages).split() if w.isalpha() and len(w) > 4]
+    questions, seen = [], set()
+    step = max(1, len(words) // max(1, count * 2))
+    for i in range(0, max(0, len(words) - 1), step):
+        pair = (words[i].lower(), words[i + 1].lower())
+        if pair in seen:
+            continue
+        seen.add(pair)
+        questions.append(f"What does the document say about {pair[0]} {pair[1]}?")
+        if len(questions) >= count:
+            break
+    return questions or ["What is this document about?"]
+
+
+def _phrases(pages: list, count: int) -> list:
+    words = " ".join(pages).split()
+    step = max(1, len(words) // max(1, count))
+    return [" ".join(words[i:i + 2]) for i in range(0, len(words), step)][:count] or ["document"]
+
+
+def _post(client, path: str, expect: int = 200, **kwargs):
+    started = time.perf_counter()
+    response = client.post(path, **kwargs)
+    elapsed = time.perf_counter() - started
+    if response.status_code != expect:
+        raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return elapsed, response
+
+
+def _first_token(client, path: str, payload: dict, headers: dict) -> float:
+    """Seconds until the first token event of an SSE answer."""
+    started = time.perf_counter()
+    response = client.post(path, json=payload, headers=headers, buffered=False)
+    first = None
+    try:
+        for chunk in response.response:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if first is None and b"event: token" in chunk:
+                first = time.perf_counter() - started
+    finally:
+        response.close()
+    return first if first is not None else time.perf_counter() - started
+
+
+def bench_document(client, pdf_path: str, questions: int) -> dict:
+    import pdf_text
+    from rag import reload_rag_model
+    from data_extraction import extract_sections
+
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    logging.warning(f"📊 Benchmarking {name}")
+    _drop_text_cache()
+    pages = pdf_text.page_texts(pdf_path)
+    n_pages = len(pages)
+
+    _drop_text_cache()
+    extract_s, _ = _timed(extract_sections, pdf_path)
+    _drop_text_cache()
+    ingest_s, doc_hash = _timed(reload_rag_model, pdf_path, activate=False)
+    reingest_s, _ = _timed(reload_rag_model, pdf_path, activate=False)
+
+    with open(pdf_path, "rb") as f:
+        _, response = _post(client, "/upload-pdf", data={"pdf": (f, os.path.basename(pdf_path))})
+    session = {"X-Session-Id": response.get_json()["session_id"]}
+
+    asked = _questions(pages, questions)
+    ask = [_post(client, "/ask", json={"question": q}, headers=session)[0] for q in asked]
+    ask_cached = [_post(client, "/ask", json={"question": q}, headers=session)[0] for q in asked]
+    first_token = [
+        _first_token(client, "/ask-stream", {"question": f"Briefly, {q[0].lower()}{q[1:]}"}, session)
+        for q in asked[:10]
+    ]
+    definitions = [_post(client, "/process-selection", json={"text": p}, headers=session)[0]
+                   for p in _phrases(pages, 10)]
+
+    mindmap = {}
+    for label, path, payload in (
+        ("structure", "/generate-mindmap", {}),
+        ("document", "/mindmap", {"scope": "document"}),
+    ):
+        mindmap[f"{label}_cold_ms"] = round(1000 * _post(client, path, json=payload, headers=session)[0], 2)
+        mindmap[f"{label}_warm_ms"] = round(1000 * _post(client, path, json=payload, headers=session)[0], 2)
+    selection = " ".join(" ".join(pages).split()[:300]) or "document"
+    mindmap["selection_ms"] = round(1000 * _post(client, "/mindmap", json={"text": selection}, headers=session)[0], 2)
+
+    return {
+        "name": name,
+        "doc_hash": doc_hash,
+        "pages": n_pages,
+        "bytes": os.path.getsize(pdf_path),
+        "extract_sections_s": round(extract_s, 4),
+        "extract_pages_per_sec": round(n_pages / extract_s, 2) if extract_s else None,
+        "ingest_s": round(ingest_s, 4),
+        "ingest_pages_per_sec": round(n_pages / ingest_s, 2) if ingest_s else None,
+        "reingest_ms": round(1000 * reingest_s, 2),
+        "ask": report.latency_summary(ask),
+        "ask_cached": report.latency_summary(ask_cached),
+        "ask_stream_first_token": report.latency_summary(first_token),
+        "definition": report.latency_summary(definitions),
+        "mindmap": mindmap,
+        "peak_rss_mb": report.peak_rss_mb(),
+        "_ask_seconds": ask,
+    }
+
+
+def bench_speech(client) -> dict:
+    import io
+
+    tts = {}
+    for label, text in (("short", "What is the main contribution of this paper?"), ("long", LONG_TTS_TEXT)):
+        cold, response = _post(client, "/tts", json={"text": text})
+        cold += _drain(response)
+        warm, response = _post(client, "/tts", json={"text": text})
+        warm += _drain(response)
+        tts[f"{label}_cold_ms"] = round(1000 * cold, 2)
+        tts[f"{label}_warm_ms"] = round(1000 * warm, 2)
+    transcribe = [
+        _post(client, "/transcribe", data={"audio": (io.BytesIO(b"what is the method"), "q.webm"),
+                                           "language": language})[0]
+        for language in ("en", "hi") * 3
+    ]
+    return {"tts": tts, "transcribe": report.latency_summary(transcribe)}
+
+
+def _drain(response) -> float:
+    started = time.perf_counter()
+    response.get_data()
+    return time.perf_counter() - started
+
+
+def run(args) -> dict:
+    from benchmarks import fakes
+
+    latency = install_fakes(args)
+    import app as app_module
+
+    client = app_module.app.test_client()
+    pdfs = args.pdf or DEFAULT_PDFS
+    if not pdfs:
+        raise SystemExit("No PDFs to benchmark; pass --pdf")
+
+    started = time.perf_counter()
+    documents = [bench_document(client, path, args.questions) for path in pdfs]
+    speech = bench_speech(client)
+
+    total_pages = sum(d["pages"] for d in documents)
+    total_ingest = sum(d["ingest_s"] for d in documents)
+    all_ask = [s for d in documents for s in d.pop("_ask_seconds")]
+    return {
+        "schema": 1,
+        "benchmark": "offline",
+        "environment": report.environment(),
+        "config": {"pdfs": [os.path.basename(p) for p in pdfs], "questions": args.questions,
+                   "latency": latency.as_dict()},
+        "metrics": {
+            "ingest_pages_per_sec": round(total_pages / total_ingest, 2) if total_ingest else None,
+            "ask": report.latency_summary(all_ask),
+            "peak_rss_mb": report.peak_rss_mb(),
+            "wall_s": round(time.perf_counter() - started, 2),
+            "documents": {d["name"]: d for d in documents},
+            "speech": speech,
+        },
+        "upstream_calls": fakes.call_counts(),
+    }
+
+
+def run_offline(args, run_fn, cache_prefix: str) -> int:
+    """
+    Call ``run_fn(args)`` in a throwaway CACHE_DIR (unless --cache-dir is
+    given) with the app's output kept off stdout, then write the result and
+    print the comparison with --baseline.
+    """
+    cache_dir = args.cache_dir or tempfile.mkdtemp(prefix=cache_prefix)
+    # modules read their settings at import time, so this must precede importing the app
+    os.environ["CACHE_DIR"] = cache_dir
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    level = logging.INFO if args.verbose else logging.WARNING
+    try:
+        # the app prints progress to stdout; keep stdout for the JSON result
+        with open(os.devnull, "w") as devnull, \
+                contextlib.redirect_stdout(sys.stderr if args.verbose else devnull):
+            # before the app's own basicConfig(level=INFO), which then has no effect
+            logging.basicConfig(level=level)
+            logging.getLogger("werkzeug").setLevel(level)
+            result = run_fn(args)
+    finally:
+        if not args.cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    report.write(result, args.out)
+    if args.baseline:
+        report.print_comparison(report.compare(args.baseline, result))
+    return 0
+
+
+def main(argv=None) -> int:
+    return run_offline(parse_args(argv), run, "woomai-bench-")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+# bm25_index.py
+"""Per-document BM25 inverted index for the lexical half of hybrid retrieval.
+
+The index is built once when a document is ingested and stored next to its
+Chroma collection (CACHE_DIR/bm25/<content hash>.json.gz). Each entry keeps
+the chunk text and metadata as well, so lexical hits can be used without a
+round trip to Chroma. A query only walks the postings of its own terms, so
+its cost does not depend on how long the chunks are.
+"""
+import os
+import re
+import gzip
+import json
+import math
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+from settings import CACHE_DIR
+
+BM25_DIR = os.path.join(CACHE_DIR, "bm25")
+BM25_MEMORY_DOCS = int(os.environ.get("BM25_MEMORY_DOCS", "8"))
+
+
+def tokenize(text: str) -> list:
+    if not text:
+        return []
+    return re.findall(r"[a-zA-Z0-9]+", text.lower())
+
+
+class BM25Index:
+    def __init__(self, ids: list, texts: list, metadatas: list, k1: float = 1.5, b: float = 0.75):
+        self.ids = list(ids)
+        self.texts = list(texts)
+        self.metadatas = list(metadatas)
+        self.k1 = k1
+        self.b = b
+        self.postings = {}   # term -> [(chunk position, term frequency), ...]
+        self.doc_len = []
+        for pos, text in enumerate(self.texts):
+            counts = Counter(tokenize(text))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((pos, tf))
+        self._prepare()
+
+    def _prepare(self) -> None:
+        n = len(self.doc_len)
+        self.avgdl = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in self.postings.items()
+        }
+
+    def search(self, query_tokens: list, n_results: int = 12) -> list:
+        """Return [(chunk position, score), ...] best first."""
+        scores = {}
+        avgdl = self.avgdl or 1.0
+        for term in set(query_tokens):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for pos, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[pos] / avgdl)
+                scores[pos] = scores.get(pos, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:n_results]
+
+    def to_dict(self) -> dict:
+        return {
+            "ids": self.ids, "texts": self.texts, "metadatas": self.metadatas,
+            "k1": self.k1, "b": self.b, "doc_len": self.doc_len,
+            "postings": {t: [list(p) for p in plist] for t, plist in self.postings.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        index = cls.__new__(cls)
+        index.ids = data["ids"]
+        index.texts = data["texts"]
+        index.metadatas = data["metadatas"]
+        index.k1 = data["k1"]
+        index.b = data["b"]
+        index.doc_len = data["doc_len"]
+        index.postings = {t: [tuple(p) for p in plist] for t, plist in data["postings"].items()}
+        index._prepare()
+        return index
+
+
+class BM25Store:
+    """Indexes by content hash: a few in memory, all of them on disk."""
+
+    def __init__(self, path: str = BM25_DIR, memory_docs: int = BM25_MEMORY_DOCS):
+        self.path = path
+        self.memory_docs = memory_docs
+        self._mem = OrderedDict()
+        self._lock = threading.Lock()
+        self._doc_locks = {}   # doc_hash -> lock held while loading or rebuilding it
+
+    def _file(self, doc_hash: str) -> str:
+        return os.path.join(self.path, f"{doc_hash}.json.gz")
+
+    def _doc_lock(self, doc_hash: str) -> threading.Lock:
+        with self._lock:
+            return self._doc_locks.setdefault(doc_hash, threading.Lock())
+
+    def _cached(self, doc_hash: str):
+        with self._lock:
+            index = self._mem.get(doc_hash)
+            if index is not None:
+                self._mem.move_to_end(doc_hash)
+            return index
+
+    def _remember(self, doc_hash: str, index: BM25Index) -> None:
+        with self._lock:
+            self._mem[doc_hash] = index
+            self._mem.move_to_end(doc_hash)
+            while len(self._mem) > self.memory_docs:
+                self._mem.popitem(last=False)
+
+    def put(self, doc_hash: str, index: BM25Index) -> None:
+        self._remember(doc_hash, index)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # unique per writer: concurrent puts of one document must not share a temp file
+            tmp = f"{self._file(doc_hash)}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(index.to_dict(), f)
+            os.replace(tmp, self._file(doc_hash))
+        except OSError:
+            logging.exception("Failed to persist BM25 index")
+
+    def get(self, doc_hash: str, rebuild=None):
+        """
+        Return the index for ``doc_hash``; when it is neither in memory nor on
+        disk, build it with ``rebuild()`` (if given) and store the result.
+        Concurrent callers for one document share a single load or rebuild.
+        """
+        index = self._cached(doc_hash)
+        if index is not None:
+            return index
+        with self._doc_lock(doc_hash):
+            index = self._cached(doc_hash)
+            if index is not None:
+                return index
+            try:
+                with gzip.open(self._file(doc_hash), "rt", encoding="utf-8") as f:
+                    index = BM25Index.from_dict(json.load(f))
+                self._remember(doc_hash, index)
+                return index
+            except FileNotFoundError:
+                pass
+            except Exception:
+                logging.exception("Corrupt BM25 index for %s; rebuilding", doc_hash)
+            if rebuild is None:
+                return None
+            index = rebuild()
+            if index is not None:
+                self.put(doc_hash, index)
+            return index
+
+    def discard(self, doc_hash: str) -> None:
+        with self._lock:
+            self._mem.pop(doc_hash, None)
+        try:
+            os.remove(self._file(doc_hash))
+        except OSError:
+            pass
+
+
+bm25_store = BM25Store()
@@ -0,0 +1,182 @@
+# doc_digest.py
+"""Whole-document digests for the mind map prompts (map-reduce).
+
+The mind map routes used to send only the first 6-10k characters of a paper.
+Instead, a long document is split into page-aligned parts of about
+DIGEST_CHUNK_CHARS, each part is summarized in parallel through a bounded
+pool (map), and the labelled summaries are joined into a digest that fits in
+one prompt (reduce); if the digest is still too long, it is summarized again
+the same way. Short documents are passed through unchanged.
+
+Part summaries are stored per document (CACHE_DIR/digests/<hash>.json.gz),
+keyed by a hash of the prompt version and the part's text, so regenerating a
+mind map or switching scope never re-summarizes the same pages. They are
+dropped together with the document when doc_registry evicts it.
+"""
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_gateway
+from pdf_text import page_texts, content_hash
+from settings import CACHE_DIR
+
+DIGEST_DIR = os.path.join(CACHE_DIR, "digests")
+DIGEST_CHUNK_CHARS = int(os.environ.get("DIGEST_CHUNK_CHARS", "12000"))
+DIGEST_MAX_CHARS = int(os.environ.get("DIGEST_MAX_CHARS", "16000"))
+DIGEST_WORKERS = int(os.environ.get("DIGEST_WORKERS", "4"))
+DIGEST_MEMORY_DOCS = int(os.environ.get("DIGEST_MEMORY_DOCS", "8"))
+PROMPT_VERSION = "1"
+
+_pool = ThreadPoolExecutor(max_workers=DIGEST_WORKERS, thread_name_prefix="digest")
+
+
+def _map_prompt(label: str, text: str) -> str:
+    return (
+        f"Summarize the following part of a research paper ({label}) as 4-8 short bullet points. "
+        "Keep concrete details: the problem, methods and algorithms, datasets, numbers and results, "
+        "contributions, limitations. Do not add anything that is not in the text. "
+        "Return only the bullet points.\n\n"
+        f"{text}"
+    )
+
+
+def _part_key(text: str) -> str:
+    return hashlib.sha256(f"{PROMPT_VERSION}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+class SummaryStore:
+    """Part summaries by document: a few documents in memory, all of them on disk."""
+
+    def __init__(self, path: str = DIGEST_DIR, memory_docs: int = DIGEST_MEMORY_DOCS):
+        self.path = path
+        self.memory_docs = memory_docs
+        self.hits = 0
+        self.misses = 0
+        self._mem = OrderedDict()   # doc_hash -> {part key: summary}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _file(self, doc_hash: str) -> str:
+        return os.path.join(self.path, f"{doc_hash}.json.gz")
+
+    def _load(self, doc_hash: str) -> dict:
+        # caller holds the lock
+        parts = self._mem.get(doc_hash)
+        if parts is None:
+            try:
+                with gzip.open(self._file(doc_hash), "rt", encoding="utf-8") as f:
+                    parts = json.load(f)
+            except FileNotFoundError:
+                parts = {}
+            except Exception:
+                logging.exception("Corrupt digest cache for %s; starting empty", doc_hash)
+                parts = {}
+            self._mem[doc_hash] = parts
+        self._mem.move_to_end(doc_hash)
+        while len(self._mem) > self.memory_docs:
+            self._mem.popitem(last=False)
+        return parts
+
+    def get(self, doc_hash: str, key: str):
+        with self._lock:
+            summary = self._load(doc_hash).get(key)
+            if summary is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return summary
+
+    def put(self, doc_hash: str, key: str, summary: str) -> None:
+        with self._lock:
+            parts = self._load(doc_hash)
+            parts[key] = summary
+        # parts of one document finish concurrently; write the latest state one at a time
+        with self._write_lock:
+            with self._lock:
+                snapshot = dict(parts)
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                tmp = self._file(doc_hash) + ".tmp"
+                with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp, self._file(doc_hash))
+            except OSError:
+                logging.exception("Failed to persist digest cache")
+
+    def discard(self, doc_hash: str) -> None:
+        # serialized with the writes in put(), so a file being written is not removed halfway
+        with self._write_lock:
+            with self._lock:
+                self._mem.pop(doc_hash, None)
+            try:
+                os.remove(self._file(doc_hash))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "documents": len(self._mem)}
+
+
+summary_store = SummaryStore()
+
+
+def _label(first: int, last: int) -> str:
+    return f"page {first}" if first == last else f"pages {first}-{last}"
+
+
+def _split(sections: list, max_chars: int) -> list:
+    """Group consecutive (first page, last page, text) sections into parts of about ``max_chars``."""
+    parts, group, size = [], [], 0
+    for section in sections:
+        if group and size + len(section[2]) > max_chars:
+            parts.append(group)
+            group, size = [], 0
+        group.append(section)
+        size += len(section[2])
+    if group:
+        parts.append(group)
+    return [(g[0][0], g[-1][1], "\n".join(s[2] for s in g)) for g in parts]
+
+
+def _join(sections: list) -> str:
+    return "\n\n".join(f"--- {_label(first, last)} ---\n{text}" for first, last, text in sections)
+
+
+def _summarize(doc_hash: str, label: str, text: str) -> str:
+    key = _part_key(text)
+    cached = summary_store.get(doc_hash, key)
+    if cached is not None:
+        return cached
+    try:
+        summary = (llm_gateway.generate(_map_prompt(label, text)) or "").strip()
+    except Exception as e:
+        logging.warning(f"⚠️ Summary of {label} failed ({e}); using its opening text")
+        return text[:1500]
+    if summary:
+        summary_store.put(doc_hash, key, summary)
+    return summary or text[:1500]
+
+
+def document_digest(pdf_path: str, max_chars: int = DIGEST_MAX_CHARS) -> str:
+    """Text covering the whole document in at most about ``max_chars`` characters."""
+    doc_hash = content_hash(pdf_path)
+    sections = [(i, i, text) for i, text in enumerate(page_texts(pdf_path), start=1) if text.strip()]
+    digest = _join(sections)
+    while len(digest) > max_chars:
+        parts = _split(sections, DIGEST_CHUNK_CHARS)
+        logging.info(f"🗺️ Summarizing {len(parts)} parts of {os.path.basename(pdf_path)}")
+        summaries = list(_pool.map(lambda part: _summarize(doc_hash, _label(part[0], part[1]), part[2]), parts))
+        condensed = [(first, last, summary) for (first, last, _), summary in zip(parts, summaries)]
+        digest = _join(condensed)
+        if len(condensed) == len(sections):
+            # every part is a single section already; nothing left to merge
+            break
+        sections = condensed
+    return digest[:max_chars]
@@ -0,0 +1,189 @@
+# doc_registry.py
+"""Persistent per-document Chroma collections.
+
+Each PDF gets its own collection named after its content hash, stored in a
+PersistentClient so it survives restarts. The collection metadata doubles as
+the registry record (source file, chunk count, last use, completeness), so
+switching back to a paper that was already indexed is a lookup instead of a
+rebuild. Least recently used collections are dropped once the number of
+documents or their estimated size exceeds its budget. The size is tracked per
+collection in its metadata: Chroma does not shrink the store directory when a
+collection is deleted, so measuring the directory cannot tell when eviction
+has freed enough.
+"""
+import os
+import time
+import hashlib
+import logging
+import threading
+
+import chromadb
+
+from settings import CACHE_DIR
+
+CHROMA_DIR = os.environ.get("CHROMA_DIR", os.path.join(CACHE_DIR, "chroma"))
+MAX_DOC_COLLECTIONS = int(os.environ.get("MAX_DOC_COLLECTIONS", "20"))
+DOC_STORE_MAX_BYTES = int(os.environ.get("DOC_STORE_MAX_MB", "1024")) * 1024 * 1024
+
+COLLECTION_PREFIX = "doc_"
+# Per-chunk index overhead (ids, metadata, HNSW links) on top of text and vector
+CHUNK_OVERHEAD_BYTES = 512
+# Size assumed per chunk for collections recorded before sizes were tracked
+LEGACY_CHUNK_BYTES = 8 * 1024
+# Queries refresh last_used at most this often (it is a metadata write)
+LAST_USED_RESOLUTION = 60
+# Incomplete collections touched this recently may still be filling (possibly in another worker)
+BUILD_GRACE = int(os.environ.get("DOC_BUILD_GRACE", "3600"))
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def estimate_size(texts: list, dim: int) -> int:
+    """Approximate bytes a collection of ``texts`` with ``dim``-float32 embeddings occupies."""
+    return sum(len(t.encode("utf-8")) for t in texts) + len(texts) * (dim * 4 + CHUNK_OVERHEAD_BYTES)
+
+
+def _record_size(record: dict) -> int:
+    size = record.get("bytes")
+    if size is None:
+        size = (record.get("chunks") or 0) * LEGACY_CHUNK_BYTES
+    return int(size)
+
+
+class DocumentRegistry:
+    def __init__(self, path: str = CHROMA_DIR, max_docs: int = MAX_DOC_COLLECTIONS,
+                 max_bytes: int = DOC_STORE_MAX_BYTES):
+        self.path = path
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self._client = None
+        self._lock = threading.RLock()
+
+    @property
+    def client(self):
+        # Created lazily so importing rag never touches the filesystem
+        if self._client is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._client = chromadb.PersistentClient(path=self.path)
+        return self._client
+
+    @staticmethod
+    def collection_name(doc_hash: str) -> str:
+        return f"{COLLECTION_PREFIX}{doc_hash[:48]}"
+
+    def _write_meta(self, collection, **updates) -> None:
+        # modify() replaces the metadata wholesale, so merge first
+        meta = dict(collection.metadata or {})
+        meta.update(updates)
+        collection.modify(metadata=meta)
+
+    def open(self, doc_hash: str, embedding_function):
+        """Return the fully indexed collection for ``doc_hash``, or None if it has to be built."""
+        with self._lock:
+            try:
+                collection = self.client.get_collection(
+                    self.collection_name(doc_hash), embedding_function=embedding_function
+                )
+            except Exception:
+                return None
+            if not (collection.metadata or {}).get("complete"):
+                return None
+            self._write_meta(collection, last_used=time.time())
+            return collection
+
+    def create(self, doc_hash: str, source: str, embedding_function):
+        """Start a fresh collection for ``doc_hash``, discarding any partial earlier build."""
+        name = self.collection_name(doc_hash)
+        with self._lock:
+            try:
+                self.client.delete_collection(name)
+                logging.info(f"Discarded incomplete collection {name}")
+            except Exception:
+                pass
+            return self.client.create_collection(
+                name=name,
+                embedding_function=embedding_function,
+                metadata={
+                    "content_hash": doc_hash,
+                    "source": source,
+                    "complete": False,
+                    "chunks": 0,
+                    "last_used": time.time(),
+                },
+            )
+
+    def mark_ready(self, collection, chunks: int, size_bytes: int = None) -> None:
+        updates = {"complete": True, "chunks": chunks, "last_used": time.time()}
+        if size_bytes is not None:
+            updates["bytes"] = int(size_bytes)
+        with self._lock:
+            self._write_meta(collection, **updates)
+
+    def touch(self, collection) -> None:
+        """Record that ``collection`` served a query, so eviction follows use rather than loading."""
+        meta = collection.metadata or {}
+        if not meta.get("complete") or time.time() - meta.get("last_used", 0) < LAST_USED_RESOLUTION:
+            return
+        with self._lock:
+            try:
+                self._write_meta(collection, last_used=time.time())
+            except Exception as e:
+                logging.warning(f"❌ Failed to update last_used of {collection.name}: {e}")
+
+    def documents(self) -> list:
+        """Registry records for every stored document, most recently used first."""
+        with self._lock:
+            records = []
+            for collection in self.client.list_collections():
+                if not collection.name.startswith(COLLECTION_PREFIX):
+                    continue
+                meta = dict(collection.metadata or {})
+                meta["name"] = collection.name
+                records.append(meta)
+        records.sort(key=lambda m: m.get("last_used", 0), reverse=True)
+        return records
+
+    def evict(self, keep=()) -> list:
+        """
+        Drop least recently used collections until within budget; never drops
+        hashes in ``keep`` or collections that may still be being built.
+        Returns the content hashes that were evicted.
+        """
+        keep_names = {self.collection_name(h) for h in keep}
+        now = time.time()
+
+        def evictable(record) -> bool:
+            if record["name"] in keep_names:
+                return False
+            return record.get("complete") or now - record.get("last_used", 0) > BUILD_GRACE
+
+        evicted = []
+        with self._lock:
+            records = self.documents()
+            total = sum(_record_size(r) for r in records)
+            while records:
+                over_count = len(records) > self.max_docs
+                over_bytes = self.max_bytes and total > self.max_bytes
+                if not (over_count or over_bytes):
+                    break
+                victim = next((r for r in reversed(records) if evictable(r)), None)
+                if victim is None:
+                    break
+                records.remove(victim)
+                total -= _record_size(victim)
+                try:
+                    self.client.delete_collection(victim["name"])
+                    evicted.append(victim.get("content_hash"))
+                    logging.info(f"🧹 Evicted collection {victim['name']} ({victim.get('source')})")
+                except Exception as e:
+                    logging.warning(f"❌ Failed to evict {victim['name']}: {e}")
+        return evicted
+
+
+registry = DocumentRegistry()
@@ -0,0 +1,134 @@
+# embedding_cache.py
+"""On-disk, content-addressed cache for text embeddings.
+
+Vectors are keyed by sha256(model name, text), so the same chunk embedded by
+any user, for any copy of a paper, is only ever sent to the API once.
+Entries older than ``max_age`` seconds are dropped and the least recently
+used ones are evicted once the cache grows past ``max_bytes``.
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+
+from settings import CACHE_DIR
+
+EMBED_CACHE_MAX_BYTES = int(os.environ.get("EMBED_CACHE_MAX_MB", "256")) * 1024 * 1024
+EMBED_CACHE_MAX_AGE = int(os.environ.get("EMBED_CACHE_MAX_AGE_DAYS", "30")) * 86400
+
+
+def cache_key(model: str, text: str) -> str:
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_bytes: int = EMBED_CACHE_MAX_BYTES, max_age: int = EMBED_CACHE_MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened lazily so importing rag never touches the filesystem
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vec BLOB NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Return a list aligned with ``texts``: the cached vector, or None on a miss."""
+        keys = [cache_key(model, t) for t in texts]
+        now = time.time()
+        found = {}
+        with self._lock:
+            try:
+                db = self._db()
+                unique = list(dict.fromkeys(keys))
+                # stay well under SQLite's bound-parameter limit
+                for i in range(0, len(unique), 500):
+                    part = unique[i:i + 500]
+                    marks = ",".join("?" * len(part))
+                    rows = db.execute(
+                        f"SELECT key, vec FROM embeddings WHERE key IN ({marks}) AND created >= ?",
+                        (*part, now - self.max_age),
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = array("f", blob).tolist()
+                if found:
+                    db.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(now, k) for k in found],
+                    )
+                    db.commit()
+            except sqlite3.Error:
+                logging.exception("Embedding cache read failed; treating as misses")
+            out = [found.get(k) for k in keys]
+            hit_count = sum(1 for v in out if v is not None)
+            self.hits += hit_count
+            self.misses += len(out) - hit_count
+        return out
+
+    def put_many(self, model: str, texts: list, vectors: list) -> None:
+        now = time.time()
+        rows = []
+        for text, vec in zip(texts, vectors):
+            blob = array("f", vec).tobytes()
+            rows.append((cache_key(model, text), blob, len(blob), now, now))
+        if not rows:
+            return
+        with self._lock:
+            try:
+                db = self._db()
+                db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+                db.commit()
+                self._evict(db, now)
+            except sqlite3.Error:
+                logging.exception("Embedding cache write failed")
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM embeddings WHERE created < ?", (now - self.max_age,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total > self.max_bytes:
+            # Free down to 90% of the budget so we don't evict on every insert
+            to_free = total - int(self.max_bytes * 0.9)
+            victims = []
+            for key, size in db.execute("SELECT key, size FROM embeddings ORDER BY last_used ASC"):
+                victims.append((key,))
+                to_free -= size
+                if to_free <= 0:
+                    break
+            db.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            logging.info(f"🧹 Evicted {len(victims)} cached embeddings")
+        db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = 0, 0
+            try:
+                entries, size = self._db().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+                ).fetchone()
+            except sqlite3.Error:
+                pass
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+
+embedding_cache = EmbeddingCache(os.path.join(CACHE_DIR, "embeddings.sqlite3"))
@@ -0,0 +1,197 @@
+# llm_gateway.py
+"""One way to call Gemini text generation.
+
+Every route used to build its own ``genai.GenerativeModel`` per request and
+call it with no limits. Going through here:
+- model clients are built once per (model, generation config) and reused;
+- each model has a cap on in-flight requests (LLM_MAX_INFLIGHT);
+- rate-limit and transient server errors are retried with exponential
+  backoff and jitter;
+- identical prompts that arrive while one is already in flight share that
+  single upstream call;
+- request counts, latency and token usage are recorded per model (stats()).
+"""
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+
+import google.generativeai as genai
+from google.api_core import exceptions as gexc
+
+from API_KEY import API_KEY
+import metrics
+
+genai.configure(api_key=API_KEY)
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+LLM_MAX_INFLIGHT = int(os.environ.get("LLM_MAX_INFLIGHT", "8"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.environ.get("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.environ.get("LLM_BACKOFF_MAX", "8"))
+
+_RETRYABLE = (
+    gexc.TooManyRequests,        # 429, including ResourceExhausted quota errors
+    gexc.ServiceUnavailable,
+    gexc.InternalServerError,
+    gexc.DeadlineExceeded,
+)
+
+_lock = threading.Lock()
+_models = {}       # (model, config key) -> GenerativeModel
+_semaphores = {}   # model -> BoundedSemaphore
+_inflight = {}     # (model, config key, prompt) -> _Call
+_metrics = {}      # model -> counters
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _config_key(generation_config) -> str:
+    return repr(sorted(generation_config.items())) if isinstance(generation_config, dict) else repr(generation_config)
+
+
+def _model_stats(model: str) -> dict:
+    stats = _metrics.get(model)
+    if stats is None:
+        stats = _metrics[model] = {
+            "requests": 0, "errors": 0, "retries": 0, "coalesced": 0, "in_flight": 0,
+            "prompt_tokens": 0, "output_tokens": 0, "latencies": deque(maxlen=500),
+        }
+    return stats
+
+
+def _bump(model: str, **deltas) -> None:
+    with _lock:
+        stats = _model_stats(model)
+        for key, value in deltas.items():
+            stats[key] += value
+
+
+def get_model(model: str = DEFAULT_MODEL, generation_config=None):
+    key = (model, _config_key(generation_config))
+    with _lock:
+        client = _models.get(key)
+        if client is None:
+            client = _models[key] = genai.GenerativeModel(model, generation_config=generation_config)
+        return client
+
+
+def _semaphore(model: str) -> threading.BoundedSemaphore:
+    with _lock:
+        sem = _semaphores.get(model)
+        if sem is None:
+            sem = _semaphores[model] = threading.BoundedSemaphore(LLM_MAX_INFLIGHT)
+        return sem
+
+
+def _backoff(attempt: int) -> float:
+    return min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+
+def _record_usage(model: str, response, started: float) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    with _lock:
+        stats = _model_stats(model)
+        stats["latencies"].append(time.perf_counter() - started)
+        if usage is not None:
+            stats["prompt_tokens"] += getattr(usage, "prompt_token_count", 0) or 0
+            stats["output_tokens"] += getattr(usage, "candidates_token_count", 0) or 0
+
+
+def _call_with_retries(model: str, generation_config, prompt, stream: bool):
+    client = get_model(model, generation_config)
+    attempt = 0
+    while True:
+        try:
+            return client.generate_content(prompt, stream=stream)
+        except _RETRYABLE as e:
+            if attempt >= LLM_MAX_RETRIES:
+                raise
+            delay = _backoff(attempt)
+            attempt += 1
+            _bump(model, retries=1)
+            logging.warning(f"⏳ {model} {type(e).__name__}; retry {attempt}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _generate_once(prompt, model: str, generation_config) -> str:
+    sem = _semaphore(model)
+    with sem:
+        _bump(model, requests=1, in_flight=1)
+        started = time.perf_counter()
+        try:
+            response = _call_with_retries(model, generation_config, prompt, stream=False)
+            text = response.text
+        except Exception:
+            _bump(model, errors=1)
+            raise
+        finally:
+            _bump(model, in_flight=-1)
+        _record_usage(model, response, started)
+        return text
+
+
+def generate(prompt, model: str = DEFAULT_MODEL, generation_config=None) -> str:
+    """Generate text for ``prompt``; concurrent identical requests share one upstream call."""
+    key = (model, _config_key(generation_config), prompt)
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+    if not leader:
+        _bump(model, coalesced=1)
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = _generate_once(prompt, model, generation_config)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def generate_stream(prompt, model: str = DEFAULT_MODEL, generation_config=None):
+    """Yield text chunks as Gemini produces them (streams are never coalesced)."""
+    sem = _semaphore(model)
+    with sem:
+        _bump(model, requests=1, in_flight=1)
+        started = time.perf_counter()
+        try:
+            response = _call_with_retries(model, generation_config, prompt, stream=True)
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # chunk without text parts (e.g. a finish/safety marker)
+                    continue
+                if text:
+                    yield text
+        except Exception:
+            _bump(model, errors=1)
+            raise
+        finally:
+            _bump(model, in_flight=-1)
+        _record_usage(model, response, started)
+
+
+def stats() -> dict:
+    with _lock:
+        out = {}
+        for model, s in _metrics.items():
+            out[model] = {k: v for k, v in s.items() if k != "latencies"}
+            out[model]["latency_ms"] = metrics.latency_summary(list(s["latencies"]))
+        return out
@@ -0,0 +1,182 @@
+# metrics.py
+"""Minimal Prometheus instrumentation (text exposition format 0.0.4).
+
+Counters and histograms with labels, plus collector callbacks that turn the
+stats() of the caches and gateways into samples at scrape time. Kept
+dependency-free; the values are per process, so with several gunicorn
+workers each worker reports its own series.
+
+Stage timings share one histogram, ``woomai_stage_seconds``, labelled with
+the pipeline stage, a coarse document size class and the cache outcome:
+
+    with timed("vector_query", doc_size=size_class(chunks)):
+        ...
+    observe("generate", seconds, cache="miss")
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_lock = threading.Lock()
+_metrics = []
+_collectors = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        with _lock:
+            _metrics.append(self)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_label_str(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        with _lock:
+            _metrics.append(self)
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            for bound, count in zip(self.buckets, series):
+                labels = _label_str(self.labelnames, key, [("le", _fmt(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(series[-2])}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def register_collector(fn) -> None:
+    """``fn()`` returns [(name, type, help, [(labels dict, value), ...]), ...] at scrape time."""
+    with _lock:
+        _collectors.append(fn)
+
+
+def render() -> str:
+    with _lock:
+        lines = []
+        for metric in _metrics:
+            lines.extend(metric.render())
+        collectors = list(_collectors)
+    for fn in collectors:
+        try:
+            families = fn()
+        except Exception:
+            continue
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                names = sorted(labels)
+                lines.append(f"{name}{_label_str(names, [labels[n] for n in names])} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Pipeline stages ───────────────────────────────────────────────────────────
+STAGE_SECONDS = Histogram(
+    "woomai_stage_seconds", "Time spent in each pipeline stage.",
+    ("stage", "doc_size", "cache"),
+)
+HTTP_REQUESTS = Counter(
+    "woomai_http_requests_total", "HTTP requests by route and status.", ("route", "method", "status"),
+)
+HTTP_SECONDS = Histogram(
+    "woomai_http_request_seconds", "Time to produce the response (headers for streams).", ("route", "method"),
+)
+
+
+def size_class(chunks) -> str:
+    """Coarse document size label from its number of indexed chunks."""
+    if chunks is None:
+        return "unknown"
+    if chunks <= 50:
+        return "small"
+    if chunks <= 300:
+        return "medium"
+    return "large"
+
+
+def percentile(values: list, pct: float) -> float:
+    """Linear-interpolated percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * pct / 100
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def latency_summary(seconds: list, digits: int = 1) -> dict:
+    """count, avg and p50/p95/p99/max of ``seconds``, in milliseconds."""
+    ms = [s * 1000 for s in seconds]
+    return {
+        "count": len(ms),
+        "avg": round(sum(ms) / len(ms), digits) if ms else 0.0,
+        "p50": round(percentile(ms, 50), digits),
+        "p95": round(percentile(ms, 95), digits),
+        "p99": round(percentile(ms, 99), digits),
+        "max": round(max(ms), digits) if ms else 0.0,
+    }
+
+
+def observe(stage: str, seconds: float, doc_size: str = "unknown", cache: str = "none") -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage, doc_size=doc_size, cache=cache)
+
+
+@contextmanager
+def timed(stage: str, doc_size: str = "unknown", cache: str = "none"):
+    """Observe the duration of the block; the yielded dict may override doc_size/cache."""
+    labels = {"doc_size": doc_size, "cache": cache}
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        observe(stage, time.perf_counter() - started, **labels)
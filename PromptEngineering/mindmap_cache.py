@@ -0,0 +1,112 @@
+# mindmap_cache.py
+"""On-disk cache of generated mind maps.
+
+A mind map only depends on the document, the scope it was asked for and (for
+selections) the selected text, so results are stored as
+CACHE_DIR/mindmaps/<content hash>/<scope>-<selection hash>.json and served
+from there until a client asks to regenerate. Bump MINDMAP_VERSION when a
+prompt changes so old results are not reused. The directory is kept under
+MINDMAP_CACHE_MAX_MB by evicting the least recently served maps whenever one
+is added, and a document's maps are dropped when the document is evicted.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+
+from settings import CACHE_DIR
+
+MINDMAP_DIR = os.path.join(CACHE_DIR, "mindmaps")
+MINDMAP_VERSION = "1"
+MINDMAP_CACHE_MAX_BYTES = int(os.environ.get("MINDMAP_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+
+def selection_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:24]
+
+
+class MindmapCache:
+    def __init__(self, path: str = MINDMAP_DIR, max_bytes: int = MINDMAP_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def _file(self, doc_hash: str, scope: str, selection: str = None) -> str:
+        name = f"{scope}-{selection_hash(selection) if selection else 'all'}-v{MINDMAP_VERSION}.json"
+        return os.path.join(self.path, doc_hash or "no-document", name)
+
+    def get(self, doc_hash: str, scope: str, selection: str = None):
+        path = self._file(doc_hash, scope, selection)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)   # mtime is the LRU clock
+        except FileNotFoundError:
+            result = None
+        except Exception:
+            logging.exception("Unreadable cached mind map; regenerating")
+            result = None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return result
+
+    def put(self, doc_hash: str, scope: str, result: dict, selection: str = None) -> None:
+        path = self._file(doc_hash, scope, selection)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            logging.exception("Failed to persist mind map")
+            return
+        self._evict(keep=path)
+
+    def discard(self, doc_hash: str) -> None:
+        """Drop every cached mind map of ``doc_hash`` (the document itself was evicted)."""
+        shutil.rmtree(os.path.join(self.path, doc_hash), ignore_errors=True)
+
+    def _evict(self, keep: str = None) -> None:
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                total += st.st_size
+                if name.endswith(".json") and path != keep:
+                    files.append((st.st_mtime, st.st_size, path))
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                with self._lock:
+                    self.evicted += 1
+            except OSError as e:
+                logging.warning(f"❌ Failed to evict cached mind map {path}: {e}")
+                continue
+            try:
+                os.rmdir(os.path.dirname(path))   # only succeeds once the document has no maps left
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evicted": self.evicted}
+
+
+mindmap_cache = MindmapCache()
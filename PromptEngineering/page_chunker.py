@@ -0,0 +1,118 @@
+# page_chunker.py
+"""Page chunking for RAG ingestion, plus the pdfplumber page extractor.
+
+When pdf_text has to fall back to pdfplumber, long PDFs are split into page
+ranges that are extracted in a process pool. This module deliberately imports
+nothing heavier than pdfplumber so spawned workers start quickly.
+"""
+import os
+import math
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pdfplumber
+
+CHUNK_SIZE = 900
+CHUNK_OVERLAP = 150
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Below this many pages the pool start-up and re-opening the PDF cost more than they save
+PARALLEL_MIN_PAGES = int(os.environ.get("EXTRACT_PARALLEL_MIN_PAGES", "8"))
+MIN_PAGES_PER_RANGE = 4
+
+_pool = None
+
+
+def chunk_id(page, chunk) -> str:
+    return f"p{page}-c{chunk}"
+
+
+def chunk_page_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list:
+    """Split one page into overlapping character windows (approximate, by characters)."""
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + chunk_size)
+        chunk = text[start:end]
+        # avoid tiny trailing chunks
+        if len(chunk.strip()) < 40 and end != len(text):
+            start = end - overlap
+            if start < 0:
+                start = 0
+            continue
+        chunks.append(chunk)
+        if end == len(text):
+            break
+        start = end - overlap
+    return chunks
+
+
+def extract_page_range(pdf_path: str, first: int, last: int) -> list:
+    """Return the text of 1-based pages first..last inclusive."""
+    out = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for idx in range(first, last + 1):
+            page = pdf.pages[idx - 1]
+            # Layout-aware extraction tends to preserve columns/ordering better
+            out.append(page.extract_text(x_tolerance=2, y_tolerance=2) or "")
+            page.close()
+    return out
+
+
+def page_ranges(page_count: int, workers: int) -> list:
+    """Contiguous 1-based (first, last) ranges; a few per worker so uneven pages balance out."""
+    if page_count <= 0:
+        return []
+    size = max(MIN_PAGES_PER_RANGE, math.ceil(page_count / (workers * 2)))
+    return [(first, min(page_count, first + size - 1)) for first in range(1, page_count + 1, size)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned (not forked) workers: the server process holds gRPC/Chroma threads
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def extract_page_texts(pdf_path: str, workers: int = EXTRACT_WORKERS) -> list:
+    """Extract every page of ``pdf_path`` with pdfplumber, in page order."""
+    with pdfplumber.open(pdf_path) as pdf:
+        page_count = len(pdf.pages)
+
+    if workers > 1 and page_count >= PARALLEL_MIN_PAGES:
+        ranges = page_ranges(page_count, workers)
+        try:
+            pool = _get_pool(workers)
+            futures = [pool.submit(extract_page_range, pdf_path, first, last) for first, last in ranges]
+            return [text for fut in futures for text in fut.result()]
+        except Exception:
+            logging.exception("Parallel page extraction failed; falling back to a single process")
+            _reset_pool()
+    return extract_page_range(pdf_path, 1, page_count)
+
+
+def chunk_pages(page_texts: list, source: str):
+    """
+    Chunk already-extracted page texts.
+
+    Returns (docs, metadatas, ids) in page/chunk order. Ids are derived from
+    the page and chunk position, so re-ingesting a document yields the same ids.
+    """
+    docs, metadatas, ids = [], [], []
+    for page_no, text in enumerate(page_texts, start=1):
+        text = (text or "").strip()
+        if not text:
+            continue
+        for chunk_idx, chunk in enumerate(chunk_page_text(text)):
+            docs.append(chunk)
+            metadatas.append({"page": page_no, "source": source, "chunk": chunk_idx})
+            ids.append(chunk_id(page_no, chunk_idx))
+    return docs, metadatas, ids
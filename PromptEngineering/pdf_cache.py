@@ -0,0 +1,314 @@
+# pdf_cache.py
+"""Download cache for remote PDFs.
+
+Files are stored once per content hash (CACHE_DIR/pdfs/<sha256>.pdf) and a
+small JSON manifest maps each URL to its file and the validators the server
+sent (ETag / Last-Modified). Asking for a URL we already have is a local
+lookup; after PDF_REVALIDATE_AFTER seconds it becomes a conditional GET that
+normally ends in a 304. Bodies are streamed to disk in chunks through one
+pooled requests.Session, an interrupted download resumes from its .part file
+with a Range request, and concurrent requests for the same URL share a
+single download. Uploaded PDFs are stored the same way.
+
+The directory is bounded to PDF_CACHE_MAX_MB: whenever a file is added, the
+least recently used PDFs are deleted until it fits again, skipping any
+document an active session is reading (and files younger than
+PDF_CACHE_MIN_AGE seconds, which may still be waiting to be indexed).
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from uuid import uuid4
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from sessions import sessions
+from settings import CACHE_DIR
+
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", os.path.join(CACHE_DIR, "pdfs"))
+PDF_REVALIDATE_AFTER = int(os.environ.get("PDF_REVALIDATE_AFTER", "300"))
+PDF_HTTP_POOL = int(os.environ.get("PDF_HTTP_POOL", "8"))
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_MB", "512")) * 1024 * 1024
+PDF_CACHE_MIN_AGE = int(os.environ.get("PDF_CACHE_MIN_AGE", "120"))
+CHUNK_BYTES = 1 << 16
+
+
+def _range_start(resp):
+    """First byte of a 206 body, from its Content-Range (``bytes 100-199/200``), or None."""
+    match = re.match(r"bytes (\d+)-", resp.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+
+
+class PdfCache:
+    def __init__(self, path: str = PDF_CACHE_DIR, revalidate_after: int = PDF_REVALIDATE_AFTER,
+                 max_bytes: int = PDF_CACHE_MAX_BYTES, min_age: int = PDF_CACHE_MIN_AGE,
+                 pinned=sessions.active_documents):
+        self.path = path
+        self.revalidate_after = revalidate_after
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.pinned = pinned   # callable returning the content hashes that must stay on disk
+        self.counters = {"hits": 0, "revalidated": 0, "downloads": 0, "resumed": 0, "uploads": 0,
+                         "deduplicated": 0, "stale_served": 0, "evicted": 0, "bytes_downloaded": 0}
+        self._manifest = None
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=PDF_HTTP_POOL, pool_maxsize=PDF_HTTP_POOL)
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+
+    # ── manifest ──────────────────────────────────────────────────────────────
+    def _manifest_file(self) -> str:
+        return os.path.join(self.path, "manifest.json")
+
+    def _entries(self) -> dict:
+        # Loaded lazily so importing pdf_utils never touches the filesystem
+        if self._manifest is None:
+            try:
+                with open(self._manifest_file(), encoding="utf-8") as f:
+                    self._manifest = json.load(f)
+            except FileNotFoundError:
+                self._manifest = {}
+            except Exception:
+                logging.exception("Corrupt PDF cache manifest; starting empty")
+                self._manifest = {}
+        return self._manifest
+
+    def _save(self) -> None:
+        os.makedirs(self.path, exist_ok=True)
+        tmp = self._manifest_file() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._manifest, f)
+        os.replace(tmp, self._manifest_file())
+
+    def _bump(self, **deltas) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self.counters[key] += value
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            lock = self._url_locks.get(url)
+            if lock is None:
+                lock = self._url_locks[url] = threading.Lock()
+            return lock
+
+    def file_for(self, sha256: str) -> str:
+        return os.path.join(self.path, f"{sha256}.pdf")
+
+    def _part_files(self, url: str):
+        base = os.path.join(self.path, "partial", _url_key(url))
+        return base + ".part", base + ".json"
+
+    # ── download ──────────────────────────────────────────────────────────────
+    def fetch(self, url: str, timeout: int = 15) -> str:
+        """Local path of the PDF at ``url``, downloading or revalidating only when needed."""
+        with self._url_lock(url):
+            with self._lock:
+                entry = dict(self._entries().get(url) or {})
+            cached = entry and os.path.exists(self.file_for(entry["sha256"]))
+            if cached and time.time() - entry.get("checked", 0) < self.revalidate_after:
+                self._bump(hits=1)
+                return self._touch(entry["sha256"])
+            try:
+                return self._download(url, entry if cached else {}, timeout)
+            except requests.RequestException as e:
+                if not cached:
+                    raise
+                # Origin unreachable: the copy we have is better than nothing
+                logging.warning(f"⚠️ Revalidation of {url} failed ({e}); serving cached copy")
+                self._bump(stale_served=1)
+                return self._touch(entry["sha256"])
+
+    def _discard_part(self, url: str) -> None:
+        for path in self._part_files(url):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _download(self, url: str, entry: dict, timeout: int, resume: bool = True) -> str:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        part_file, part_meta = self._part_files(url)
+        offset = os.path.getsize(part_file) if resume and os.path.exists(part_file) else 0
+        if offset:
+            try:
+                with open(part_meta, encoding="utf-8") as f:
+                    validator = json.load(f).get("validator")
+            except (OSError, ValueError):
+                validator = None
+            if validator:
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+            else:
+                offset = 0
+
+        resp = self._http.get(url, headers=headers, stream=True, timeout=timeout)
+        # 416: the .part already holds the whole body (killed before _insert); a 206 that does not
+        # start at our offset cannot be appended either. Either way, start over from byte 0.
+        if offset and (resp.status_code == 416 or (resp.status_code == 206 and _range_start(resp) != offset)):
+            resp.close()
+            logging.warning(f"⚠️ Cannot resume {url} at byte {offset} (HTTP {resp.status_code}); restarting")
+            self._discard_part(url)
+            return self._download(url, entry, timeout, resume=False)
+
+        with resp:
+            if resp.status_code == 304:
+                self._bump(revalidated=1)
+                self._touch(entry["sha256"])
+                return self._record(url, entry["sha256"], entry.get("etag"), entry.get("last_modified"))
+            resp.raise_for_status()
+
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            resumed = resp.status_code == 206 and offset > 0
+            os.makedirs(os.path.dirname(part_file), exist_ok=True)
+            with open(part_meta, "w", encoding="utf-8") as f:
+                json.dump({"url": url, "validator": etag or last_modified}, f)
+
+            digest = hashlib.sha256()
+            if resumed:
+                logging.info(f"📥 Resuming {url} at byte {offset}")
+                with open(part_file, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        digest.update(block)
+            else:
+                logging.info(f"📥 Downloading PDF from {url}")
+            received = 0
+            with open(part_file, "ab" if resumed else "wb") as f:
+                for chunk in resp.iter_content(CHUNK_BYTES):
+                    if chunk:
+                        f.write(chunk)
+                        digest.update(chunk)
+                        received += len(chunk)
+
+        self._bump(downloads=1, resumed=int(resumed), bytes_downloaded=received)
+        sha256 = digest.hexdigest()
+        self._insert(part_file, sha256)
+        try:
+            os.remove(part_meta)
+        except OSError:
+            pass
+        return self._record(url, sha256, etag, last_modified)
+
+    def add(self, stream) -> str:
+        """Store the PDF read from file object ``stream`` (e.g. an upload) and return its path."""
+        part_file = os.path.join(self.path, "partial", f"upload-{uuid4().hex}.part")
+        os.makedirs(os.path.dirname(part_file), exist_ok=True)
+        digest = hashlib.sha256()
+        with open(part_file, "wb") as f:
+            for chunk in iter(lambda: stream.read(CHUNK_BYTES), b""):
+                f.write(chunk)
+                digest.update(chunk)
+        self._bump(uploads=1)
+        return self._insert(part_file, digest.hexdigest())
+
+    def _insert(self, part_file: str, sha256: str) -> str:
+        target = self.file_for(sha256)
+        if os.path.exists(target):
+            # Same bytes already cached (another URL, or uploaded before)
+            self._bump(deduplicated=1)
+            os.remove(part_file)
+            self._touch(sha256)
+        else:
+            os.replace(part_file, target)
+            logging.info(f"✅ PDF saved at {target}")
+        self._evict(keep={sha256})
+        return target
+
+    def _touch(self, sha256: str) -> str:
+        # File mtime is the LRU clock
+        path = self.file_for(sha256)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def _files(self) -> list:
+        """[(sha256, size, mtime), ...] for every cached PDF, least recently used first."""
+        files = []
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return files
+        for name in names:
+            if not name.endswith(".pdf"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            files.append((name[:-4], st.st_size, st.st_mtime))
+        files.sort(key=lambda f: f[2])
+        return files
+
+    def _evict(self, keep=()) -> None:
+        if not self.max_bytes:
+            return
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return
+        protected = set(keep) | set(self.pinned() if self.pinned else ())
+        now = time.time()
+        removed = set()
+        for sha256, size, mtime in files:
+            if total <= self.max_bytes:
+                break
+            if sha256 in protected or now - mtime < self.min_age:
+                continue
+            try:
+                os.remove(self.file_for(sha256))
+            except OSError as e:
+                logging.warning(f"❌ Failed to evict cached PDF {sha256}: {e}")
+                continue
+            total -= size
+            removed.add(sha256)
+            logging.info(f"🧹 Evicted cached PDF {sha256} ({size} bytes)")
+        if not removed:
+            return
+        self._bump(evicted=len(removed))
+        with self._lock:
+            entries = self._entries()
+            for url in [u for u, e in entries.items() if e.get("sha256") in removed]:
+                del entries[url]
+            try:
+                self._save()
+            except OSError:
+                logging.exception("Failed to persist PDF cache manifest")
+
+    def _record(self, url: str, sha256: str, etag, last_modified) -> str:
+        with self._lock:
+            self._entries()[url] = {
+                "sha256": sha256, "etag": etag, "last_modified": last_modified, "checked": time.time(),
+            }
+            try:
+                self._save()
+            except OSError:
+                logging.exception("Failed to persist PDF cache manifest")
+        return self.file_for(sha256)
+
+    def stats(self) -> dict:
+        files = self._files()
+        with self._lock:
+            return dict(self.counters, urls=len(self._entries()), files=len(files),
+                        bytes=sum(size for _, size, _ in files), max_bytes=self.max_bytes)
+
+
+pdf_cache = PdfCache()
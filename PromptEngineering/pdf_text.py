@@ -0,0 +1,172 @@
+# pdf_text.py
+"""Single place where PDFs are turned into text.
+
+Every route used to re-open the file with its own engine (pdfplumber for RAG
+and section extraction, PyMuPDF for the mind maps). Here a document is parsed
+once per content hash with PyMuPDF, falling back to pdfplumber when PyMuPDF
+fails or finds no text, and the page texts and word/font data are kept in a
+small in-memory LRU so later calls for the same document are free.
+"""
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+
+import pdfplumber
+
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz  # PyMuPDF < 1.24
+    except ImportError:
+        fitz = None
+
+from doc_registry import file_sha256
+from page_chunker import extract_page_texts
+from pdf_cache import PDF_CACHE_DIR
+
+TEXT_CACHE_DOCS = int(os.environ.get("TEXT_CACHE_DOCS", "8"))
+HASH_MEMO_SIZE = 256
+_CACHED_NAME = re.compile(r"^[0-9a-f]{64}\.pdf$")
+
+_cache = OrderedDict()   # doc_hash -> {"backend", "pages", "words"}
+_hash_memo = OrderedDict()   # (path, mtime_ns, size) -> doc_hash
+_lock = threading.Lock()
+_doc_locks = {}
+
+
+def content_hash(pdf_path: str) -> str:
+    """
+    sha256 of the file. Taken from the name of pdf_cache files; otherwise
+    memoized on (path, mtime, size) so repeated calls don't re-read it.
+    """
+    path = os.path.abspath(pdf_path)
+    name = os.path.basename(path)
+    # pdf_cache names its files by content hash (and bumps their mtime on every hit)
+    if _CACHED_NAME.match(name) and os.path.dirname(path) == os.path.abspath(PDF_CACHE_DIR):
+        return name[:-len(".pdf")]
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    with _lock:
+        doc_hash = _hash_memo.get(key)
+        if doc_hash is not None:
+            _hash_memo.move_to_end(key)
+            return doc_hash
+    doc_hash = file_sha256(path)
+    with _lock:
+        _hash_memo[key] = doc_hash
+        while len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+    return doc_hash
+
+
+def _doc_lock(doc_hash: str) -> threading.Lock:
+    with _lock:
+        return _doc_locks.setdefault(doc_hash, threading.Lock())
+
+
+def _entry(doc_hash: str) -> dict:
+    with _lock:
+        entry = _cache.get(doc_hash)
+        if entry is None:
+            entry = {"backend": None, "pages": None, "words": None}
+            _cache[doc_hash] = entry
+        _cache.move_to_end(doc_hash)
+        while len(_cache) > TEXT_CACHE_DOCS:
+            old_hash, _ = _cache.popitem(last=False)
+            _doc_locks.pop(old_hash, None)
+        return entry
+
+
+def _pymupdf_pages(pdf_path: str) -> list:
+    with fitz.open(pdf_path) as doc:
+        return [page.get_text() for page in doc]
+
+
+def _pymupdf_words(pdf_path: str) -> list:
+    """Per-page word dicts (text, fontname, size, doctop) built from PyMuPDF spans."""
+    pages = []
+    offset = 0.0
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            words = []
+            for block in page.get_text("dict")["blocks"]:
+                for line in block.get("lines", []):
+                    for span in line["spans"]:
+                        top = offset + span["bbox"][1]
+                        for token in span["text"].split():
+                            words.append({
+                                "text": token,
+                                "fontname": span["font"],
+                                "size": span["size"],
+                                "doctop": top,
+                            })
+            pages.append(words)
+            offset += page.rect.height
+    return pages
+
+
+def _pdfplumber_words(pdf_path: str) -> list:
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            pages.append(page.extract_words(
+                x_tolerance=3,
+                y_tolerance=3,
+                extra_attrs=["fontname", "size", "doctop"]
+            ))
+            page.close()
+    return pages
+
+
+def page_texts(pdf_path: str) -> list:
+    """Text of every page, in order (empty string for pages without text)."""
+    doc_hash = content_hash(pdf_path)
+    entry = _entry(doc_hash)
+    if entry["pages"] is not None:
+        return entry["pages"]
+    with _doc_lock(doc_hash):
+        if entry["pages"] is not None:
+            return entry["pages"]
+        pages, backend = None, None
+        if fitz is not None:
+            try:
+                pages, backend = _pymupdf_pages(pdf_path), "pymupdf"
+            except Exception:
+                logging.exception("PyMuPDF extraction failed; falling back to pdfplumber")
+        if not pages or not any(p.strip() for p in pages):
+            pages, backend = extract_page_texts(pdf_path), "pdfplumber"
+        logging.info(f"📄 Extracted {len(pages)} pages from {os.path.basename(pdf_path)} with {backend}")
+        entry["backend"] = backend
+        entry["pages"] = pages
+        return pages
+
+
+def page_words(pdf_path: str) -> list:
+    """Per-page lists of words with ``text``, ``fontname``, ``size`` and ``doctop``."""
+    doc_hash = content_hash(pdf_path)
+    entry = _entry(doc_hash)
+    if entry["words"] is not None:
+        return entry["words"]
+    with _doc_lock(doc_hash):
+        if entry["words"] is not None:
+            return entry["words"]
+        words = None
+        if fitz is not None:
+            try:
+                words = _pymupdf_words(pdf_path)
+            except Exception:
+                logging.exception("PyMuPDF word extraction failed; falling back to pdfplumber")
+        if not words or not any(words):
+            words = _pdfplumber_words(pdf_path)
+        entry["words"] = words
+        return words
+
+
+def full_text(pdf_path: str, page_markers: bool = False) -> str:
+    pages = page_texts(pdf_path)
+    if page_markers:
+        return "".join(f"\n--- Page {i} ---\n{text}\n" for i, text in enumerate(pages, start=1))
+    return "\n\n".join(pages).strip()
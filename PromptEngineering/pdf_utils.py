@@ -1,87 +1,71 @@
 # pdf_utils.py
 import os
-import re
 import logging
 import threading
-import requests
-import shutil
-import time
-from uuid import uuid4
+from concurrent.futures import ThreadPoolExecutor
 
 from rag import reload_rag_model   # wherever your reload logic lives
-
-# global state
-current_pdf_url = None
-current_pdf_path = None
-model_loading   = False
+from sessions import sessions, DEFAULT_SESSION
+from pdf_cache import pdf_cache
 
 #CHANGED
 def download_pdf(url: str, timeout: int = 15) -> str:
-    # Create a unique, time-stamped folder per session/request
-    timestamp = int(time.time())
-    unique_id = str(uuid4())[:8]
-    session_folder = os.path.join("pdfs", f"session_{timestamp}_{unique_id}")
-    os.makedirs(session_folder, exist_ok=True)
-
-    # Create a safe filename from the URL
-    safe_name = re.sub(r'\W+', '_', url)[:50] + ".pdf"
-    local_path = os.path.join(session_folder, safe_name)
-
-    # Skip download if already exists (optional)
-    if os.path.exists(local_path):
-        return local_path
+    """Local path of the PDF at ``url``; repeated links are served from the download cache."""
+    return pdf_cache.fetch(url, timeout=timeout)
 
-    # Download the PDF
-    logging.info(f"📥 Downloading PDF from {url}")
-    resp = requests.get(url, timeout=timeout)
-    resp.raise_for_status()
-    with open(local_path, "wb") as f:
-        f.write(resp.content)
-
-    logging.info(f"✅ PDF saved at {local_path}")
-    return local_path
-
-def _download_and_reload(pdf_url: str):
+def _download_and_reload(pdf_url: str, session_id: str):
     """Download the PDF and reload the RAG model in background."""
-    global current_pdf_path, model_loading
     try:
         path = download_pdf(pdf_url)
-        current_pdf_path = path
-        reload_rag_model(path)
+        doc_hash = reload_rag_model(path)
+        sessions.bind(session_id, doc_hash, path, pdf_url)
         logging.info("Background download & RAG reload complete")
     except Exception:
         logging.exception("Background download/reload failed")
     finally:
-        model_loading = False
+        sessions.finish_loading(session_id)
 
-def ensure_pdf_loaded(pdf_url: str):
+def ensure_pdf_loaded(pdf_url: str, session_id: str = DEFAULT_SESSION):
     """
-    If this is a new PDF URL, kick off a background thread
+    If this is a new PDF URL for the session, kick off a background thread
     to download & reload the model, and immediately return.
     """
-    global current_pdf_url, model_loading
-    if pdf_url != current_pdf_url:
-        current_pdf_url = pdf_url
-        model_loading   = True
-        thread = threading.Thread(
-            target=_download_and_reload, args=(pdf_url,), daemon=True
-        )
-        thread.start()
-        logging.info(f"Started background download & reload for {pdf_url}")
-
-#ADDED
-def cleanup_old_pdfs(base_dir="pdfs", max_age=600):
-    now = time.time()
-    if not os.path.exists(base_dir):
+    current = sessions.resolve(session_id)
+    if sessions.is_loading(session_id) or (current and current["pdf_link"] == pdf_url):
         return
+    sessions.mark_loading(session_id, pdf_url)
+    thread = threading.Thread(
+        target=_download_and_reload, args=(pdf_url, session_id), daemon=True
+    )
+    thread.start()
+    logging.info(f"Started background download & reload for {pdf_url}")
+
+
+# Search results prefetched in the background so opening one is a cache hit
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", "1"))
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+_prefetching = set()
+_prefetch_lock = threading.Lock()
+
+def _prefetch(url: str, index: bool):
+    try:
+        path = download_pdf(url)
+        if index:
+            reload_rag_model(path, activate=False)
+        logging.info(f"📦 Prefetched {url}")
+    except Exception:
+        logging.exception(f"Prefetch of {url} failed")
+    finally:
+        with _prefetch_lock:
+            _prefetching.discard(url)
 
-    for folder in os.listdir(base_dir):
-        folder_path = os.path.join(base_dir, folder)
-        if os.path.isdir(folder_path):
-            created_time = os.path.getctime(folder_path)
-            if now - created_time > max_age:
-                try:
-                    shutil.rmtree(folder_path)
-                    logging.info(f"🧹 Deleted old folder: {folder_path}")
-                except Exception as e:
-                    logging.warning(f"❌ Failed to delete {folder_path}: {e}")
\ No newline at end of file
+def prefetch_pdfs(urls, index: bool = True):
+    """Download (and with ``index``, embed) these PDFs in the background; returns immediately."""
+    for url in urls:
+        if not url:
+            continue
+        with _prefetch_lock:
+            if url in _prefetching:
+                continue
+            _prefetching.add(url)
+        _prefetch_pool.submit(_prefetch, url, index)
@@ -0,0 +1,92 @@
+# phrase_index.py
+"""Token n-gram index that maps a highlighted span to the chunk containing it.
+
+Text selected in the viewer almost always appears verbatim in the document,
+so /process-selection can find its passage with a few dictionary lookups
+instead of embedding the selection and querying Chroma. Chunk text is
+normalized to lowercase alphanumeric tokens (with end-of-line hyphenation
+joined) so differences in whitespace and punctuation between the PDF text
+layer and our extraction do not matter.
+"""
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+PHRASE_MEMORY_DOCS = int(os.environ.get("PHRASE_MEMORY_DOCS", "8"))
+# Share of a selection's trigrams a chunk must contain to count as a fuzzy match
+PHRASE_FUZZY_MIN = float(os.environ.get("PHRASE_FUZZY_MIN", "0.6"))
+GRAM = 3
+
+
+def normalize_tokens(text: str) -> list:
+    if not text:
+        return []
+    text = re.sub(r"(\w)-\s*\n\s*(\w)", r"\1\2", text)
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _grams(tokens: list) -> list:
+    return [tuple(tokens[i:i + GRAM]) for i in range(len(tokens) - GRAM + 1)]
+
+
+class PhraseIndex:
+    def __init__(self, texts: list):
+        self.norm = []
+        self.unigrams = {}   # token -> {chunk position}
+        self.trigrams = {}   # (t1, t2, t3) -> {chunk position}
+        for pos, text in enumerate(texts):
+            tokens = normalize_tokens(text)
+            self.norm.append(f" {' '.join(tokens)} ")
+            for tok in set(tokens):
+                self.unigrams.setdefault(tok, set()).add(pos)
+            for gram in set(_grams(tokens)):
+                self.trigrams.setdefault(gram, set()).add(pos)
+
+    def lookup(self, selection: str, fuzzy_min: float = PHRASE_FUZZY_MIN):
+        """Chunk position containing ``selection`` (earliest first), a fuzzy best match, or None."""
+        tokens = normalize_tokens(selection)
+        if not tokens:
+            return None
+        needle = f" {' '.join(tokens)} "
+        if len(tokens) >= GRAM:
+            postings = [self.trigrams.get(g, set()) for g in _grams(tokens)]
+        else:
+            postings = [self.unigrams.get(t, set()) for t in tokens]
+
+        # Exact: every n-gram present, then confirm the contiguous phrase
+        if all(postings):
+            candidates = set.intersection(*sorted(postings, key=len))
+            for pos in sorted(candidates):
+                if needle in self.norm[pos]:
+                    return pos
+
+        # Fuzzy: e.g. a selection spanning two chunks or with a stray extraction difference
+        if len(tokens) < GRAM:
+            return None
+        hits = Counter()
+        for plist in postings:
+            hits.update(plist)
+        if not hits:
+            return None
+        pos, count = min(hits.items(), key=lambda kv: (-kv[1], kv[0]))
+        return pos if count / len(postings) >= fuzzy_min else None
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def phrase_index_for(doc_hash: str, texts: list) -> PhraseIndex:
+    """Memoized PhraseIndex for a document; ``texts`` is only read on the first call."""
+    with _lock:
+        index = _indexes.get(doc_hash)
+        if index is not None:
+            _indexes.move_to_end(doc_hash)
+            return index
+    index = PhraseIndex(texts)
+    with _lock:
+        _indexes[doc_hash] = index
+        while len(_indexes) > PHRASE_MEMORY_DOCS:
+            _indexes.popitem(last=False)
+    return index
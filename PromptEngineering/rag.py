@@ -3,18 +3,42 @@ import logging
 import google.generativeai as genai
 from chromadb import Documents, EmbeddingFunction, Embeddings
 from google.api_core import retry
-import chromadb
 from data_extraction import extract_sections
+from embedding_cache import EmbeddingCache, embedding_cache
+from answer_cache import answer_cache
+from bm25_index import BM25Index, bm25_store, tokenize as _tokenize
+from mindmap_cache import mindmap_cache
+from doc_digest import summary_store
+from phrase_index import phrase_index_for
+from doc_registry import registry, estimate_size
+from sessions import sessions
+from page_chunker import chunk_pages
+from pdf_text import page_texts, content_hash
 from API_KEY import API_KEY
+import llm_gateway
+import metrics
 import os
-import pdfplumber
-import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 genai.configure(api_key=API_KEY)
 
-chroma_client = chromadb.Client()
+# Most recently loaded collection; used when a caller does not name a document
 db = None
+_collections = {}   # doc_hash -> collection handle opened by this process
+
+RETRIEVAL_CANDIDATES = 12
+RRF_K = 60
+
+# Pages embedded and added per step; with progressive ingestion the first step is all a reader waits for
+INGEST_GROUP_PAGES = int(os.environ.get("INGEST_GROUP_PAGES", "4"))
+# doc_hash -> {source, status, pages_total, pages_extracted, chunks_total, chunks_embedded, chunks_indexed}
+ingest_progress = {}
+_building = {}   # doc_hash -> collection still being filled
+_builds = {}     # doc_hash -> Event set when the load that claimed it has finished
+_progress_lock = threading.Lock()
 
 def create_documents_from_dict(topic_text_dict):
     documents = []
@@ -26,39 +50,139 @@ def create_documents_from_dict(topic_text_dict):
     
     return documents
 
+EMBED_MODEL = "models/text-embedding-004"
+EMBED_DIM = 768
+# Gemini's batchEmbedContents accepts at most 100 requests per call
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+EMBED_MAX_WORKERS = int(os.environ.get("EMBED_MAX_WORKERS", "4"))
+
+
 class GeminiEmbeddingFunction(EmbeddingFunction):
+    def __init__(self, batch_size: int = EMBED_BATCH_SIZE, max_workers: int = EMBED_MAX_WORKERS,
+                 cache: EmbeddingCache = embedding_cache):
+        self.batch_size = max(1, min(int(batch_size), 100))
+        self.max_workers = max(1, int(max_workers))
+        # Shared by ingestion and query embedding; None disables caching
+        self.cache = cache
+
+    def _embed_one(self, text: str) -> list:
+        try:
+            resp = genai.embed_content(
+                model=EMBED_MODEL,
+                content=text,
+                # task_type can be omitted; the model infers it sufficiently well
+                request_options={"retry": retry.Retry(predicate=retry.if_transient_error)},
+            )
+            return resp["embedding"]
+        except Exception:
+            logging.exception("Embedding failed; using zero vector fallback")
+            return [0.0] * EMBED_DIM
+
+    def _embed_batch(self, batch: list) -> list:
+        """Embed one batch in a single request; items that come back empty are retried on their own."""
+        try:
+            resp = genai.embed_content(
+                model=EMBED_MODEL,
+                content=batch,
+                request_options={"retry": retry.Retry(predicate=retry.if_transient_error)},
+            )
+            vectors = resp.get("embedding") or []
+        except Exception as e:
+            logging.warning("Batch embedding of %d items failed (%s); retrying items individually", len(batch), e)
+            vectors = []
+        out = []
+        for i, text in enumerate(batch):
+            vec = vectors[i] if i < len(vectors) else None
+            out.append(vec if vec else self._embed_one(text))
+        return out
+
+    def _embed_uncached(self, items: list) -> list:
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+        embeddings = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+            # map() yields results in submission order, so output lines up with input
+            for vectors in pool.map(self._embed_batch, batches):
+                embeddings.extend(vectors)
+        return embeddings
+
     def __call__(self, input: Documents) -> Embeddings:
-        # Chroma calls this with a list of strings; return a list of vectors
+        # Chroma calls this with a list of strings; return a list of vectors in the same order
         items = input if isinstance(input, list) else [input]
-        embeddings: Embeddings = []
-        for text in items:
-            try:
-                resp = genai.embed_content(
-                    model="models/text-embedding-004",
-                    content=text,
-                    # task_type can be omitted; the model infers it sufficiently well
-                    request_options={"retry": retry.Retry(predicate=retry.if_transient_error)},
-                )
-                embeddings.append(resp["embedding"])
-            except Exception:
-                logging.exception("Embedding failed; using zero vector fallback")
-                embeddings.append([0.0] * 768)
+        if not items:
+            return []
+        if self.cache is None:
+            return self._embed_uncached(items)
+
+        embeddings = self.cache.get_many(EMBED_MODEL, items)
+        missing = [i for i, vec in enumerate(embeddings) if vec is None]
+        if missing:
+            fresh = self._embed_uncached([items[i] for i in missing])
+            for i, vec in zip(missing, fresh):
+                embeddings[i] = vec
+            # Never persist the zero-vector fallback of a failed request
+            ok = [(items[i], vec) for i, vec in zip(missing, fresh) if any(vec)]
+            if ok:
+                self.cache.put_many(EMBED_MODEL, [t for t, _ in ok], [v for _, v in ok])
         return embeddings
 
 
-def get_contextual_definition(highlighted_text):
+_query_embedder = GeminiEmbeddingFunction()
+
+
+def _find_phrase_passage(search_term: str, collection):
+    """Chunk text containing ``search_term`` exactly (or nearly), or None to fall back to a vector query."""
+    index = _bm25_for(collection)
+    if index is None:
+        return None
+    phrases = phrase_index_for(collection.metadata["content_hash"], index.texts)
+    pos = phrases.lookup(search_term)
+    return index.texts[pos] if pos is not None else None
+
+
+def _doc_size(collection) -> str:
+    """Size label of ``collection`` for stage metrics."""
+    meta = collection.metadata or {}
+    chunks = meta.get("chunks")
+    if not chunks:
+        with _progress_lock:
+            chunks = ingest_progress.get(meta.get("content_hash"), {}).get("chunks_total")
+    return metrics.size_class(chunks or None)
+
+
+def document_size(doc_hash: str = None) -> str:
+    """Size label of a loaded document, or "unknown"."""
+    try:
+        return _doc_size(collection_for(doc_hash))
+    except LookupError:
+        return "unknown"
+
+
+def get_contextual_definition(highlighted_text, doc_hash: str = None):
     search_term = highlighted_text.strip()
     print(f"🔍 Looking up: '{search_term}'")
+    started = time.perf_counter()
+    collection = collection_for(doc_hash)
+    size = _doc_size(collection)
 
-    results = db.query(query_texts=[search_term], n_results=1)
+    # A highlighted span is usually verbatim in the document: resolve it locally first
+    with metrics.timed("phrase_lookup", doc_size=size) as labels:
+        passage = _find_phrase_passage(search_term, collection)
+        labels["cache"] = "miss" if passage is None else "hit"
+    phrase = labels["cache"]
+    if passage is None:
+        with metrics.timed("vector_query", doc_size=size):
+            results = collection.query(query_texts=[search_term], n_results=1)
 
-    if not results["documents"] or not results["documents"][0]:
-        print("⚠️ No relevant passage found. Returning fallback.")
-        return f"❌ No relevant passage found for '{search_term}'. Please try a more specific phrase."
+        if not results["documents"] or not results["documents"][0]:
+            print("⚠️ No relevant passage found. Returning fallback.")
+            return f"❌ No relevant passage found for '{search_term}'. Please try a more specific phrase."
 
-    [[passage]] = results["documents"]
+        [[passage]] = results["documents"]
 
     print(f"📚 Found passage: {passage[:200]}...")
+    flat_passage = passage.replace('\n', ' ')
     
     # Create explanation prompt
 #     prompt = f"""Explain the specific meaning and context of the term '{search_term}' 
@@ -92,16 +216,17 @@ Formatting Rules:
 - Do not use hashtags (#), bullet points, or code blocks.
 - Keep all text in standard Markdown without special characters.
 
-Passage: {passage.replace('\n', ' ')}
+Passage: {flat_passage}
 """
 
 
     
     # Generate and return answer
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
-    response = model.generate_content(prompt)
+    with metrics.timed("generate", doc_size=size):
+        text = llm_gateway.generate(prompt)
+    metrics.observe("definition", time.perf_counter() - started, doc_size=size, cache=phrase)
     s = f"\nContextual meaning of '{search_term}':"
-    return(s + response.text)
+    return(s + text)
 
 # Run the interactive lookup
 '''
@@ -109,130 +234,329 @@ for highlighted_text in clipboard_highight_monitor():
     print(get_contextual_definition(highlighted_text))
 '''
 
-def reload_rag_model(pdf_path: str = None) -> None:
+def _set_progress(doc_hash: str, **fields) -> None:
+    with _progress_lock:
+        ingest_progress.setdefault(doc_hash, {}).update(fields)
+
+
+def get_ingest_progress() -> dict:
+    """Snapshot of per-document ingestion progress, keyed by content hash."""
+    with _progress_lock:
+        return {h: dict(p) for h, p in ingest_progress.items()}
+
+
+def _page_groups(metadatas: list) -> list:
+    """Split chunk positions into (start, end) slices covering INGEST_GROUP_PAGES pages each."""
+    groups = []
+    start = 0
+    first_page = None
+    for i, meta in enumerate(metadatas):
+        page = meta.get("page")
+        if first_page is None:
+            first_page = page
+        elif page is not None and first_page is not None and page - first_page >= INGEST_GROUP_PAGES:
+            groups.append((start, i))
+            start, first_page = i, page
+    if start < len(metadatas):
+        groups.append((start, len(metadatas)))
+    return groups
+
+
+def collection_for(doc_hash: str = None):
+    """
+    Collection for ``doc_hash`` (opening a stored one if needed), or the most
+    recently loaded collection when no document is named.
+    """
+    if not doc_hash:
+        if db is None:
+            raise LookupError("No PDF loaded")
+        registry.touch(db)
+        return db
+    with _progress_lock:
+        collection = _building.get(doc_hash) or _collections.get(doc_hash)
+    if collection is None:
+        collection = registry.open(doc_hash, GeminiEmbeddingFunction())
+        if collection is None:
+            raise LookupError(f"Document {doc_hash} is not loaded")
+        with _progress_lock:
+            _collections[doc_hash] = collection
+    registry.touch(collection)
+    return collection
+
+
+def reload_rag_model(pdf_path: str = None, progressive: bool = False, activate: bool = True) -> str:
     """
-    Build or rebuild the Chroma collection from scratch.
+    Load the collection for this PDF (and, with ``activate``, make it the
+    default ``db``), building it only if the document has not been fully
+    indexed before.
+    Returns the document's content hash, which callers pass back to
+    chat_with_doc / get_contextual_definition to address this document.
+
+    With ``progressive`` the first group of pages is indexed before this
+    returns and the rest are embedded and added in page order on a
+    background thread, so questions can be answered from the early pages
+    right away.
+
+    Concurrent loads of one document share a single build: a caller that
+    finds it running waits for it to finish (a progressive caller takes the
+    partial collection instead).
     """
     global db
+    started = time.perf_counter()
+    doc_hash = content_hash(pdf_path)
+    source = os.path.basename(pdf_path)
+    # One load per document at a time: registry.create() would discard a collection another thread is filling
+    while True:
+        with _progress_lock:
+            finished = _builds.get(doc_hash)
+            if finished is None:
+                _builds[doc_hash] = threading.Event()
+                break
+            building = _building.get(doc_hash)
+        if progressive and building is not None:
+            if activate:
+                db = building
+            logging.info(f"⏳ '{pdf_path}' is still being indexed; using the partial collection.")
+            return doc_hash
+        logging.info(f"⏳ '{pdf_path}' is being indexed by another request; waiting for it.")
+        finished.wait()
+
+    handed_off = False
     try:
-        chroma_client.delete_collection("googlecardb")
-        logging.info("Deleted existing collection.")
-    except:
-        logging.info("No existing collection to delete; continuing.")
-
-    db = chroma_client.get_or_create_collection(
-        name="googlecardb",
-        embedding_function=GeminiEmbeddingFunction()
-    )
+        embedding_function = GeminiEmbeddingFunction()
+        existing = registry.open(doc_hash, embedding_function)
+        if existing is not None:
+            if activate:
+                db = existing
+            with _progress_lock:
+                _collections[doc_hash] = existing
+            count = existing.count()
+            _set_progress(doc_hash, source=source, status="ready", chunks_total=count,
+                          chunks_embedded=count, chunks_indexed=count)
+            metrics.observe("ingest", time.perf_counter() - started, doc_size=metrics.size_class(count), cache="hit")
+            logging.info(f"✅ Reusing indexed collection for '{pdf_path}' ({count} page-chunks).")
+            return doc_hash
+
+        handed_off = _build_collection(doc_hash, pdf_path, source, embedding_function, progressive,
+                                       activate, started)
+    finally:
+        if not handed_off:
+            _release_build(doc_hash)
+    return doc_hash
+
+
+def _release_build(doc_hash: str) -> None:
+    with _progress_lock:
+        _building.pop(doc_hash, None)
+        finished = _builds.pop(doc_hash, None)
+    if finished is not None:
+        finished.set()
+
+
+def _build_collection(doc_hash: str, pdf_path: str, source: str, embedding_function, progressive: bool,
+                      activate: bool, started: float) -> bool:
+    """
+    Index ``pdf_path`` into a fresh collection. Returns True when the remaining
+    pages were handed to a background thread, which then releases the build.
+    """
+    global db
+    collection = registry.create(doc_hash, source, embedding_function)
+    if activate:
+        db = collection
+    with _progress_lock:
+        _building[doc_hash] = collection
+        _collections[doc_hash] = collection
+    _set_progress(doc_hash, source=source, status="extracting", pages_total=0, pages_extracted=0,
+                  chunks_total=0, chunks_embedded=0, chunks_indexed=0)
 
-    # Ingest per page, then chunk to improve recall; keep page metadata
-    docs = []
-    metadatas = []
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for idx, page in enumerate(pdf.pages, start=1):
-                # Layout-aware extraction tends to preserve columns/ordering better
-                text = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
-                text = text.strip()
-                if not text:
-                    continue
-                # chunk the page text (approx by characters)
-                chunk_size = 900
-                overlap = 150
-                start = 0
-                chunk_idx = 0
-                while start < len(text):
-                    end = min(len(text), start + chunk_size)
-                    chunk = text[start:end]
-                    # avoid tiny trailing chunks
-                    if len(chunk.strip()) < 40 and end != len(text):
-                        start = end - overlap
-                        if start < 0:
-                            start = 0
-                        continue
-                    docs.append(chunk)
-                    metadatas.append({
-                        "page": idx,
-                        "source": os.path.basename(pdf_path),
-                        "chunk": chunk_idx
-                    })
-                    chunk_idx += 1
-                    if end == len(text):
-                        break
-                    start = end - overlap
-    except Exception as e:
-        logging.exception("Failed to extract pages for RAG: %s", e)
-        docs = []
-        metadatas = []
-
-    if not docs:
-        # Fallback to previous section extraction when pages empty
-        topic_text_dict = extract_sections(pdf_path)
-        docs = create_documents_from_dict(topic_text_dict)
-        metadatas = [{"page": None, "source": os.path.basename(pdf_path)} for _ in docs]
-
-    db.add(documents=docs, metadatas=metadatas, ids=[str(i) for i in range(len(docs))])
-    logging.info(f"✅ RAG model reset from '{pdf_path}', {len(docs)} page-chunks loaded.")
-
-
-def _tokenize(text: str) -> list:
-    if not text:
-        return []
-    return re.findall(r"[a-zA-Z0-9]+", text.lower())
-
-
-def _lexical_overlap_score(query_tokens: list, doc_text: str) -> float:
-    if not query_tokens or not doc_text:
-        return 0.0
-    doc_tokens = set(_tokenize(doc_text))
-    if not doc_tokens:
-        return 0.0
-    overlap = sum(1 for t in set(query_tokens) if t in doc_tokens)
-    return overlap / max(1, len(set(query_tokens)))
-
-
-def chat_with_doc(user_question):
-    # Clean the input
-    query = user_question.strip()
+        # Ingest per page, then chunk to improve recall; keep page metadata
+        # Stage timings are observed once the chunk count (the size label) is known
+        timings = {}
+        try:
+            t0 = time.perf_counter()
+            pages = page_texts(pdf_path)
+            t1 = time.perf_counter()
+            _set_progress(doc_hash, pages_total=len(pages), pages_extracted=len(pages))
+            docs, metadatas, ids = chunk_pages(pages, source)
+            timings.update(extract=t1 - t0, chunk=time.perf_counter() - t1)
+        except Exception as e:
+            logging.exception("Failed to extract pages for RAG: %s", e)
+            docs, metadatas, ids = [], [], []
+
+        if not docs:
+            # Fallback to previous section extraction when pages empty
+            t0 = time.perf_counter()
+            topic_text_dict = extract_sections(pdf_path)
+            docs = create_documents_from_dict(topic_text_dict)
+            metadatas = [{"page": None, "source": source} for _ in docs]
+            ids = [f"s{i}" for i in range(len(docs))]
+            timings["extract_sections"] = time.perf_counter() - t0
+
+        size = metrics.size_class(len(docs))
+        for stage, seconds in timings.items():
+            metrics.observe(stage, seconds, doc_size=size)
+
+        # Lexical index is built from the full chunk list up front, before any embedding
+        with metrics.timed("bm25_build", doc_size=size):
+            bm25_store.put(doc_hash, BM25Index(ids, docs, metadatas))
+        _set_progress(doc_hash, status="indexing", chunks_total=len(docs))
+        groups = _page_groups(metadatas)
+
+        def embed(start: int, end: int) -> list:
+            with metrics.timed("embed", doc_size=size):
+                return embedding_function(docs[start:end])
+
+        def add_group(start: int, end: int, embeddings: list) -> None:
+            with metrics.timed("index", doc_size=size):
+                collection.add(documents=docs[start:end], metadatas=metadatas[start:end],
+                               ids=ids[start:end], embeddings=embeddings)
+            _set_progress(doc_hash, chunks_indexed=end)
+
+        def index_groups(todo: list) -> None:
+            """Embed ``todo`` groups concurrently and add them to the collection in page order."""
+            with ThreadPoolExecutor(max_workers=min(embedding_function.max_workers, len(todo))) as pool:
+                for (start, end), embeddings in zip(todo, pool.map(lambda group: embed(*group), todo)):
+                    _set_progress(doc_hash, chunks_embedded=end)
+                    add_group(start, end, embeddings)
+
+        def finish() -> None:
+            registry.mark_ready(collection, len(docs), estimate_size(docs, EMBED_DIM))
+            # documents open in a live session or still being built stay indexed
+            with _progress_lock:
+                keep = {doc_hash} | set(_building)
+            for evicted_hash in registry.evict(keep=keep | sessions.active_documents()):
+                bm25_store.discard(evicted_hash)
+                mindmap_cache.discard(evicted_hash)
+                summary_store.discard(evicted_hash)
+                with _progress_lock:
+                    _collections.pop(evicted_hash, None)
+            _set_progress(doc_hash, status="ready")
+            metrics.observe("ingest", time.perf_counter() - started, doc_size=size, cache="miss")
+            logging.info(f"✅ RAG model reset from '{pdf_path}', {len(docs)} page-chunks loaded.")
+
+        if progressive and len(groups) > 1:
+            start, end = groups[0]
+            embeddings = embed(start, end)
+            _set_progress(doc_hash, chunks_embedded=end)
+            add_group(start, end, embeddings)
+            metrics.observe("ingest_first_group", time.perf_counter() - started, doc_size=size, cache="miss")
+            logging.info(f"⚡ First {groups[0][1]} page-chunks of '{pdf_path}' are queryable; indexing the rest.")
+            threading.Thread(
+                target=_index_remaining, args=(doc_hash, groups[1:], index_groups, finish), daemon=True
+            ).start()
+            return True
+
+        # one call over every chunk, so the embedding function fills whole batches and runs them in parallel
+        embeddings = embed(0, len(docs))
+        _set_progress(doc_hash, chunks_embedded=len(docs))
+        for start, end in groups:
+            add_group(start, end, embeddings[start:end])
+        finish()
+    except Exception:
+        _set_progress(doc_hash, status="failed")
+        raise
+    return False
+
+
+def _index_remaining(doc_hash: str, groups: list, index_groups, finish) -> None:
+    try:
+        index_groups(groups)
+        finish()
+    except Exception:
+        logging.exception("Progressive indexing failed")
+        _set_progress(doc_hash, status="failed")
+    finally:
+        _release_build(doc_hash)
+
+
+def _bm25_for(collection):
+    """BM25 index of ``collection``, rebuilt from Chroma for documents indexed before it existed."""
+    doc_hash = (collection.metadata or {}).get("content_hash")
+    if not doc_hash:
+        return None
+
+    def rebuild():
+        with _progress_lock:
+            if doc_hash in _building:
+                return None
+        got = collection.get(include=["documents", "metadatas"])
+        if not got["ids"]:
+            return None
+        return BM25Index(got["ids"], got["documents"], got["metadatas"])
+
+    try:
+        return bm25_store.get(doc_hash, rebuild)
+    except Exception:
+        logging.exception("BM25 index unavailable; using vector ranking only")
+        return None
+
+
+def _cacheable_doc_hash(collection):
+    """Content hash of ``collection``, or None while it is still being filled."""
+    doc_hash = (collection.metadata or {}).get("content_hash")
+    with _progress_lock:
+        if doc_hash is None or doc_hash in _building:
+            return None
+    return doc_hash
+
+
+def _prepare_answer(query: str, collection, namespace: str = "") -> dict:
+    """
+    Everything answering needs short of generation.
+
+    Returns {"answer": payload} when no generation is needed (answer-cache hit
+    in ``namespace`` or nothing retrieved); otherwise {"prompt", "context",
+    "meta", "doc_hash", "embedding", "namespace"} where meta holds the page,
+    snippet and anchors of the best chunk.
+    """
+    # Same document + same (or, if enabled, near-identical) question -> reuse the answer
+    doc_hash = _cacheable_doc_hash(collection)
+    size = _doc_size(collection)
+    query_embedding = None
+    if doc_hash and answer_cache.similarity > 0:
+        # Embedded once here and reused for the Chroma query below
+        with metrics.timed("query_embed", doc_size=size):
+            query_embedding = _query_embedder([query])[0]
+    if doc_hash:
+        with metrics.timed("answer_cache", doc_size=size) as labels:
+            cached = answer_cache.get(doc_hash, query, embedding=query_embedding, namespace=namespace)
+            labels["cache"] = "miss" if cached is None else "hit"
+        if cached is not None:
+            return {"answer": cached, "doc_size": size, "cache": "hit"}
 
     # Query ChromaDB for relevant context
     query_tokens = _tokenize(query)
-    results = db.query(query_texts=[query], n_results=12)
-    if not results.get("documents") or not results["documents"][0]:
-        return {"text": "Sorry, I couldn’t find that in the document.", "page": None}
-    passages = results["documents"][0]
-    metadatas = results.get("metadatas", [[{}]])[0]
-    distances = results.get("distances", [[None]])[0]
-
-    ranked = []
-    for idx, p in enumerate(passages):
-        dist = distances[idx]
-        # Convert distance to similarity if available; else assume neutral
-        vec_sim = 0.0
-        if dist is not None:
-            try:
-                vec_sim = 1.0 / (1.0 + float(dist))
-            except Exception:
-                vec_sim = 0.0
-        lex = _lexical_overlap_score(query_tokens, p)
-        combined = 0.65 * vec_sim + 0.35 * lex
-        ranked.append((combined, idx, p))
-
-    ranked.sort(reverse=True, key=lambda x: x[0])
+    with metrics.timed("vector_query", doc_size=size):
+        if query_embedding is not None:
+            results = collection.query(query_embeddings=[query_embedding], n_results=RETRIEVAL_CANDIDATES)
+        else:
+            results = collection.query(query_texts=[query], n_results=RETRIEVAL_CANDIDATES)
+    ids = (results.get("ids") or [[]])[0]
+    passages = (results.get("documents") or [[]])[0] or []
+    metadatas = (results.get("metadatas") or [[]])[0] or [{}] * len(passages)
+
+    # Reciprocal rank fusion of the vector and BM25 candidate lists
+    fused = {}   # chunk id -> [score, passage, metadata]
+    for rank, (cid, p, m) in enumerate(zip(ids, passages, metadatas)):
+        fused[cid] = [1.0 / (RRF_K + rank + 1), p, m if isinstance(m, dict) else {}]
+    with metrics.timed("bm25_fusion", doc_size=size):
+        index = _bm25_for(collection)
+        if index is not None:
+            for rank, (pos, _) in enumerate(index.search(query_tokens, RETRIEVAL_CANDIDATES)):
+                entry = fused.setdefault(index.ids[pos], [0.0, index.texts[pos], index.metadatas[pos] or {}])
+                entry[0] += 1.0 / (RRF_K + rank + 1)
+    if not fused:
+        return {"answer": {"text": "Sorry, I couldn’t find that in the document.", "page": None},
+                "doc_size": size, "cache": "none"}
+
+    ranked = sorted(fused.values(), key=lambda e: e[0], reverse=True)
     # Top chunk determines primary page for scrolling
-    best_idx = ranked[0][1]
-    top_page = metadatas[best_idx].get("page") if metadatas and isinstance(metadatas[best_idx], dict) else None
-    best_chunk = passages[best_idx] if 0 <= best_idx < len(passages) else ""
+    top_page = ranked[0][2].get("page")
+    best_chunk = ranked[0][1] or ""
 
     # Build compact context from top 4 chunks
-    top_ctx = []
-    for _, i, p in ranked[:4]:
-        m = metadatas[i] if i < len(metadatas) else {}
-        top_ctx.append((m.get("page"), p))
-    try:
-        page_meta = results.get("metadatas", [[{}]])[0][0].get("page")
-    except Exception:
-        page_meta = None
+    top_ctx = [(m.get("page"), p) for _, p, m in ranked[:4]]
 
     # Build compact context with citations
     joined_context = "\n\n".join(
@@ -254,10 +578,6 @@ Question: {query}
 Answer:
 """
 
-
-
-    model = genai.GenerativeModel("gemini-2.5-flash-lite")
-    response = model.generate_content(prompt)
     # Provide a snippet and n-gram anchors from the best chunk to enable precise client-side location
     snippet = (best_chunk or "").strip()
     if len(snippet) > 220:
@@ -271,4 +591,172 @@ Answer:
             anchors.append(tri)
         if len(anchors) >= 6:
             break
-    return {"text": response.text, "page": top_page, "snippet": snippet, "anchors": anchors}
+    return {
+        "prompt": prompt,
+        "context": joined_context,
+        "meta": {"page": top_page, "snippet": snippet, "anchors": anchors},
+        "doc_hash": doc_hash,
+        "embedding": query_embedding,
+        "namespace": namespace,
+        "doc_size": size,
+        "cache": "miss" if doc_hash else "none",
+    }
+
+
+def _finish_answer(query: str, prepared: dict, text: str, **extra) -> dict:
+    answer = dict(prepared["meta"], text=text, **extra)
+    if prepared["doc_hash"]:
+        answer_cache.put(prepared["doc_hash"], query, answer, embedding=prepared["embedding"],
+                         namespace=prepared["namespace"])
+    return answer
+
+
+def chat_with_doc(user_question, doc_hash: str = None):
+    # Clean the input
+    query = user_question.strip()
+    started = time.perf_counter()
+    prepared = _prepare_answer(query, collection_for(doc_hash))
+    if "answer" in prepared:
+        metrics.observe("chat", time.perf_counter() - started, prepared["doc_size"], prepared["cache"])
+        return prepared["answer"]
+
+    with metrics.timed("generate", doc_size=prepared["doc_size"]):
+        text = llm_gateway.generate(prepared["prompt"])
+    metrics.observe("chat", time.perf_counter() - started, prepared["doc_size"], prepared["cache"])
+    return _finish_answer(query, prepared, text)
+
+
+def stream_chat_with_doc(user_question, doc_hash: str = None):
+    """
+    Streaming counterpart of chat_with_doc.
+
+    Yields ("meta", {page, snippet, anchors}) as soon as retrieval is done,
+    then ("token", text) for each generated chunk, then ("done", answer)
+    with the same payload chat_with_doc would have returned.
+    """
+    query = user_question.strip()
+    started = time.perf_counter()
+    prepared = _prepare_answer(query, collection_for(doc_hash))
+    if "answer" in prepared:
+        metrics.observe("chat", time.perf_counter() - started, prepared["doc_size"], prepared["cache"])
+        answer = prepared["answer"]
+        yield "meta", {k: answer.get(k) for k in ("page", "snippet", "anchors")}
+        yield "token", answer.get("text") or ""
+        yield "done", answer
+        return
+
+    yield "meta", prepared["meta"]
+    parts = []
+    with metrics.timed("generate", doc_size=prepared["doc_size"]):
+        for text in llm_gateway.generate_stream(prepared["prompt"]):
+            if not parts:
+                metrics.observe("first_token", time.perf_counter() - started, prepared["doc_size"])
+            parts.append(text)
+            yield "token", text
+    metrics.observe("chat", time.perf_counter() - started, prepared["doc_size"], prepared["cache"])
+    yield "done", _finish_answer(query, prepared, "".join(parts))
+
+
+# ── Bilingual answers ─────────────────────────────────────────────────────────
+# Retrieval runs on the English question; one generation call then writes the
+# answer in the reader's language followed by the English answer, instead of
+# answering in English and translating the answer in a second call.
+BILINGUAL_SEPARATOR = "===ENGLISH==="
+
+
+def _bilingual_prompt(context: str, question: str, question_en: str, language: str) -> str:
+    return f"""
+You are a helpful assistant answering ONLY from the provided context.
+
+Style:
+- Clear, human, single paragraph, 2–4 sentences, ≤80 words.
+- Start with the direct answer. No markdown.
+
+Context:
+{context}
+
+Question ({language}): {question}
+Question (English): {question_en}
+
+Write the answer in {language}. Then write a line containing only {BILINGUAL_SEPARATOR}
+and then the same answer in English. Output nothing else.
+
+Answer:
+"""
+
+
+def _split_bilingual(text: str):
+    """(answer in the reader's language, English answer) from one bilingual generation."""
+    local, sep, english = (text or "").partition(BILINGUAL_SEPARATOR)
+    local, english = local.strip(), english.strip()
+    if not sep:
+        # separator missing: the model answered once; use it for both
+        return local, local
+    return local or english, english or local
+
+
+def _prepare_bilingual(question: str, question_en: str, language: str, doc_hash: str):
+    prepared = _prepare_answer(question_en.strip(), collection_for(doc_hash), namespace=f"bilingual:{language}")
+    if "answer" not in prepared:
+        prepared["prompt"] = _bilingual_prompt(prepared["context"], question.strip(), question_en.strip(), language)
+    return prepared
+
+
+def chat_with_doc_bilingual(question: str, question_en: str, language: str = "Hindi", doc_hash: str = None) -> dict:
+    """
+    Answer ``question`` (asked in ``language``) in one generation call.
+    Returns chat_with_doc's payload with ``text`` in ``language`` plus ``text_en``.
+    """
+    prepared = _prepare_bilingual(question, question_en, language, doc_hash)
+    if "answer" in prepared:
+        answer = prepared["answer"]
+        answer.setdefault("text_en", answer.get("text"))
+        return answer
+    with metrics.timed("generate_bilingual", doc_size=prepared["doc_size"]):
+        text = llm_gateway.generate(prepared["prompt"])
+    local, english = _split_bilingual(text)
+    return _finish_answer(question_en.strip(), prepared, local, text_en=english)
+
+
+def stream_chat_with_doc_bilingual(question: str, question_en: str, language: str = "Hindi",
+                                   doc_hash: str = None):
+    """
+    Streaming counterpart of chat_with_doc_bilingual: ("meta", {...}), then
+    ("token", text) for the answer in ``language``, ("token_en", text) for
+    the English answer, then ("done", answer).
+    """
+    prepared = _prepare_bilingual(question, question_en, language, doc_hash)
+    if "answer" in prepared:
+        answer = prepared["answer"]
+        answer.setdefault("text_en", answer.get("text"))
+        yield "meta", {k: answer.get(k) for k in ("page", "snippet", "anchors")}
+        yield "token", answer.get("text") or ""
+        yield "token_en", answer.get("text_en") or ""
+        yield "done", answer
+        return
+
+    yield "meta", prepared["meta"]
+    parts, pending, event = [], "", "token"
+    hold = len(BILINGUAL_SEPARATOR) - 1   # a separator may be split across chunks
+    started = time.perf_counter()
+    for text in llm_gateway.generate_stream(prepared["prompt"]):
+        parts.append(text)
+        pending += text
+        if event == "token" and BILINGUAL_SEPARATOR in pending:
+            before, _, pending = pending.partition(BILINGUAL_SEPARATOR)
+            pending = pending.lstrip()
+            if before:
+                yield "token", before
+            event = "token_en"
+        if event == "token" and len(pending) > hold:
+            yield "token", pending[:-hold]
+            pending = pending[-hold:]
+        elif event == "token_en" and pending:
+            yield "token_en", pending
+            pending = ""
+    if pending:
+        yield event, pending
+    metrics.observe("generate_bilingual", time.perf_counter() - started, prepared["doc_size"])
+    local, english = _split_bilingual("".join(parts))
+    yield "done", _finish_answer(question_en.strip(), prepared, local, text_en=english)
+
@@ -0,0 +1,112 @@
+# sessions.py
+"""Which document each reader is looking at.
+
+A request names its document either directly (a content hash) or through a
+session id; each session points at the document it loaded last. Requests
+that carry neither share the "default" session, which is how the app
+behaved when this state lived in module globals. Sessions that have not
+been touched for SESSION_TTL seconds are forgotten, together with the
+documents no remaining session has open. A document whose PDF file has
+been evicted from the PDF cache counts as not loaded.
+"""
+import os
+import time
+import threading
+
+DEFAULT_SESSION = "default"
+SESSION_TTL = int(os.environ.get("SESSION_TTL", str(6 * 3600)))
+
+
+def _present(pdf_path: str) -> bool:
+    return bool(pdf_path) and os.path.exists(pdf_path)
+
+
+class SessionRegistry:
+    def __init__(self, ttl: int = SESSION_TTL):
+        self.ttl = ttl
+        self._sessions = {}    # session id -> {doc_hash, pdf_path, pdf_link, loading, touched}
+        self._documents = {}   # doc_hash -> {doc_hash, pdf_path, pdf_link}
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        stale = [sid for sid, s in self._sessions.items() if now - s["touched"] > self.ttl]
+        for sid in stale:
+            del self._sessions[sid]
+        live = {s["doc_hash"] for s in self._sessions.values()}
+        for doc_hash in [h for h in self._documents if h not in live]:
+            del self._documents[doc_hash]
+
+    def _session(self, session_id: str, now: float) -> dict:
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = {
+                "doc_hash": None, "pdf_path": None, "pdf_link": None, "loading": False,
+            }
+        session["touched"] = now
+        return session
+
+    def mark_loading(self, session_id: str, pdf_link: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._session(session_id or DEFAULT_SESSION, now)
+            session["loading"] = True
+            session["pdf_link"] = pdf_link
+
+    def finish_loading(self, session_id: str) -> None:
+        with self._lock:
+            session = self._sessions.get(session_id or DEFAULT_SESSION)
+            if session is not None:
+                session["loading"] = False
+
+    def bind(self, session_id: str, doc_hash: str, pdf_path: str, pdf_link: str = None) -> None:
+        """Make ``doc_hash`` (stored at ``pdf_path``) the current document of ``session_id``."""
+        now = time.time()
+        with self._lock:
+            session = self._session(session_id or DEFAULT_SESSION, now)
+            session.update(doc_hash=doc_hash, pdf_path=pdf_path, pdf_link=pdf_link, loading=False)
+            self._documents[doc_hash] = {"doc_hash": doc_hash, "pdf_path": pdf_path, "pdf_link": pdf_link}
+            # after the update, so the document this session just left is dropped too
+            self._expire(now)
+
+    def resolve(self, session_id: str = None, doc_hash: str = None):
+        """
+        The document a request refers to: ``doc_hash`` when given and known,
+        otherwise the session's current document. Returns a dict with
+        doc_hash, pdf_path and pdf_link, or None.
+        """
+        now = time.time()
+        with self._lock:
+            if doc_hash:
+                doc = self._documents.get(doc_hash)
+                if doc and not _present(doc["pdf_path"]):
+                    del self._documents[doc_hash]
+                    return None
+                return dict(doc) if doc else None
+            session = self._sessions.get(session_id or DEFAULT_SESSION)
+            if session is None or not session["doc_hash"]:
+                return None
+            session["touched"] = now
+            if not _present(session["pdf_path"]):
+                session.update(doc_hash=None, pdf_path=None)
+                return None
+            return {k: session[k] for k in ("doc_hash", "pdf_path", "pdf_link")}
+
+    def is_loading(self, session_id: str = None) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_id or DEFAULT_SESSION)
+            return bool(session and session["loading"])
+
+    def active_documents(self) -> set:
+        """Content hashes currently open in at least one live session."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            return {s["doc_hash"] for s in self._sessions.values() if s["doc_hash"]}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "documents": len(self._documents)}
+
+
+sessions = SessionRegistry()
@@ -0,0 +1,6 @@
+# settings.py
+"""Settings shared by several modules; module-specific ones stay next to their code."""
+import os
+
+# Root of every on-disk cache (embeddings, Chroma, BM25, PDFs, digests, mind maps, audio)
+CACHE_DIR = os.environ.get("CACHE_DIR", "cache")
@@ -0,0 +1,260 @@
+# speech.py
+"""Speech-to-text engines behind /transcribe.
+
+Audio stays in memory end to end and the engine clients (Google Cloud
+Speech, ElevenLabs) are created once per process and shared, instead of
+writing every upload to a temp file and building a client per request.
+For Google, the primary and the simplified fallback recognition configs run
+concurrently and the first non-empty transcript wins, so a miss on the
+primary no longer costs a second serial round trip. Latency is recorded per
+engine (stats()).
+
+Streaming recognizers turn an iterator of audio frames into (is_final, text)
+updates as the frames arrive. They are looked up by name in
+STREAMING_RECOGNIZERS; "fake" treats each frame as UTF-8 text and needs no
+credentials, which is what local tests and benchmarks use.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from elevenlabs import ElevenLabs
+
+from API_KEY import ELEVENLABS_API_KEY
+import metrics
+
+try:
+    from google.cloud import speech as google_speech
+except Exception:
+    google_speech = None
+
+STT_WORKERS = int(os.environ.get("STT_WORKERS", "8"))
+STT_STREAM_ENGINE = os.environ.get("STT_STREAM_ENGINE", "google")
+ELEVENLABS_STT_MODEL = "scribe_v1"
+
+_pool = ThreadPoolExecutor(max_workers=STT_WORKERS, thread_name_prefix="stt")
+_lock = threading.Lock()
+_clients = {}
+_metrics = {}   # engine -> counters
+
+
+def _client(name: str, factory):
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = factory()
+        return client
+
+
+def elevenlabs_client():
+    """Process-wide ElevenLabs client (shared by speech-to-text and /tts)."""
+    return _client("elevenlabs", lambda: ElevenLabs(api_key=ELEVENLABS_API_KEY))
+
+
+def google_client():
+    return _client("google", google_speech.SpeechClient)
+
+
+def _record(engine: str, started: float, ok: bool) -> None:
+    with _lock:
+        stats = _metrics.get(engine)
+        if stats is None:
+            stats = _metrics[engine] = {"requests": 0, "errors": 0, "latencies": deque(maxlen=500)}
+        stats["requests"] += 1
+        stats["errors"] += 0 if ok else 1
+        stats["latencies"].append(time.perf_counter() - started)
+    metrics.observe(f"stt_{engine}", time.perf_counter() - started)
+
+
+def _timed(engine: str, fn, *args):
+    started = time.perf_counter()
+    try:
+        result = fn(*args)
+    except Exception:
+        _record(engine, started, ok=False)
+        raise
+    _record(engine, started, ok=True)
+    return result
+
+
+# ── Google Cloud Speech ───────────────────────────────────────────────────────
+def _google_encoding(ext: str):
+    encodings = google_speech.RecognitionConfig.AudioEncoding
+    return {
+        ".webm": encodings.WEBM_OPUS,
+        ".ogg": encodings.OGG_OPUS,
+        ".mp3": encodings.MP3,
+    }.get((ext or "").lower(), encodings.ENCODING_UNSPECIFIED)
+
+
+def google_configs(ext: str) -> dict:
+    """Primary and fallback recognition configs for Hindi (with English mixed in)."""
+    return {
+        "google": google_speech.RecognitionConfig(
+            encoding=_google_encoding(ext),
+            language_code='hi-IN',
+            alternative_language_codes=['hi', 'en-IN'],
+            enable_automatic_punctuation=True,
+            audio_channel_count=1
+        ),
+        # simplified config for audio the primary one cannot decode
+        "google_fallback": google_speech.RecognitionConfig(
+            encoding=google_speech.RecognitionConfig.AudioEncoding.ENCODING_UNSPECIFIED,
+            language_code='hi',
+            enable_automatic_punctuation=True
+        ),
+    }
+
+
+def _google_recognize(config, audio):
+    response = google_client().recognize(config=config, audio=audio)
+    text_parts, conf_vals = [], []
+    for result in response.results:
+        if result.alternatives:
+            text_parts.append((result.alternatives[0].transcript or '').strip())
+            try:
+                conf_vals.append(float(getattr(result.alternatives[0], 'confidence', 1.0)))
+            except Exception:
+                pass
+    text = ' '.join(t for t in text_parts if t)
+    return text, (sum(conf_vals) / len(conf_vals) if conf_vals else 1.0)
+
+
+def transcribe_google(content: bytes, ext: str) -> dict:
+    audio = google_speech.RecognitionAudio(content=content)
+    futures = {
+        _pool.submit(_timed, engine, _google_recognize, config, audio): engine
+        for engine, config in google_configs(ext).items()
+    }
+    confidence = 1.0
+    for future in as_completed(futures):
+        try:
+            text, conf = future.result()
+        except Exception as e:
+            logging.error(f"{futures[future]} STT failed: {e}")
+            continue
+        if text:
+            return {"text": text, "language": 'hi-IN', "confidence": conf, "engine": futures[future]}
+        confidence = conf
+    return {"text": "", "language": 'hi-IN', "confidence": confidence, "engine": "google"}
+
+
+# ── ElevenLabs ────────────────────────────────────────────────────────────────
+def _elevenlabs_convert(content: bytes, filename: str, language: str):
+    return elevenlabs_client().speech_to_text.convert(
+        model_id=ELEVENLABS_STT_MODEL,
+        file=(filename, content),
+        language_code=language,
+        diarize=False,
+        timestamps_granularity="word"
+    )
+
+
+def transcribe_elevenlabs(content: bytes, filename: str, language: str) -> dict:
+    transcription = _timed("elevenlabs", _elevenlabs_convert, content, filename, language)
+    text = transcription.text if hasattr(transcription, 'text') else str(transcription)
+    text = (text or '').strip()
+    return {
+        "text": text,
+        "language": getattr(transcription, 'language_code', language or 'en'),
+        "confidence": getattr(transcription, 'language_probability', 1.0 if text else 0.0),
+        "engine": "elevenlabs",
+    }
+
+
+# ── Streaming recognition ─────────────────────────────────────────────────────
+def _language_codes(language: str):
+    if (language or '').lower().startswith('hi'):
+        return 'hi-IN', ['en-IN']
+    return 'en-US', []
+
+
+class GoogleStreamingRecognizer:
+    def __init__(self, ext: str = '.webm', sample_rate: int = None):
+        self.ext = ext
+        self.sample_rate = sample_rate
+
+    def recognize(self, frames, language: str = 'en'):
+        language_code, alternatives = _language_codes(language)
+        # headerless 16-bit PCM (audio/l16) has nothing to detect the format from; sample_rate is required
+        encoding = (google_speech.RecognitionConfig.AudioEncoding.LINEAR16 if self.ext == '.raw'
+                    else _google_encoding(self.ext))
+        config = dict(
+            encoding=encoding,
+            language_code=language_code,
+            alternative_language_codes=alternatives,
+            enable_automatic_punctuation=True,
+        )
+        if self.sample_rate:
+            config["sample_rate_hertz"] = self.sample_rate
+        streaming_config = google_speech.StreamingRecognitionConfig(
+            config=google_speech.RecognitionConfig(**config), interim_results=True
+        )
+        requests = (google_speech.StreamingRecognizeRequest(audio_content=frame) for frame in frames)
+        finals = []
+        for response in google_client().streaming_recognize(config=streaming_config, requests=requests):
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                text = (result.alternatives[0].transcript or '').strip()
+                if result.is_final:
+                    finals.append(text)
+                    yield False, ' '.join(t for t in finals if t)
+                else:
+                    yield False, ' '.join(t for t in finals + [text] if t)
+        yield True, ' '.join(t for t in finals if t)
+
+
+class FakeStreamingRecognizer:
+    """Treats every frame as UTF-8 text; a partial after each frame, the joined text at the end."""
+
+    def __init__(self, ext: str = None, sample_rate: int = None):
+        pass
+
+    def recognize(self, frames, language: str = 'en'):
+        words = []
+        for frame in frames:
+            chunk = frame.decode('utf-8', errors='ignore').strip()
+            if chunk:
+                words.append(chunk)
+                yield False, ' '.join(words)
+        yield True, ' '.join(words)
+
+
+STREAMING_RECOGNIZERS = {
+    "google": GoogleStreamingRecognizer,
+    "fake": FakeStreamingRecognizer,
+}
+
+
+def streaming_transcripts(frames, language: str = 'en', engine: str = None, ext: str = '.webm',
+                          sample_rate: int = None):
+    """Yield (is_final, transcript) while ``frames`` are consumed; the last item is final."""
+    engine = engine or STT_STREAM_ENGINE
+    factory = STREAMING_RECOGNIZERS.get(engine)
+    if factory is None:
+        raise ValueError(f"Unknown streaming engine '{engine}'")
+    if engine == "google" and google_speech is None:
+        raise RuntimeError("google-cloud-speech is not installed")
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield from factory(ext, sample_rate).recognize(frames, language)
+        ok = True
+    finally:
+        _record(f"{engine}_stream", started, ok)
+
+
+def stats() -> dict:
+    with _lock:
+        out = {}
+        for engine, s in _metrics.items():
+            out[engine] = {
+                "requests": s["requests"],
+                "errors": s["errors"],
+                "latency_ms": metrics.latency_summary(list(s["latencies"])),
+            }
+        return out
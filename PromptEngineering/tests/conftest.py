@@ -0,0 +1,17 @@
+# tests/conftest.py
+"""Run the backend modules offline: a throwaway CACHE_DIR and the benchmark fakes for every upstream."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# modules read their settings at import time
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="woomai-tests-")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+from benchmarks import fakes  # noqa: E402
+
+# a little embedding latency keeps concurrent builds overlapping
+fakes.install(fakes.Latency(embed=0.02, embed_item=0.0, generate=0.0, token=0.0, tts=0.0,
+                            tts_chunk=0.0, stt=0.0, search=0.0, jitter=0.0))
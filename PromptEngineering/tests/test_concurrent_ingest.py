@@ -0,0 +1,62 @@
+# tests/test_concurrent_ingest.py
+import os
+import threading
+
+import rag
+from doc_registry import registry
+
+PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads",
+                   "15-05-2021-084550The-Alchemist-Paulo-Coelho.pdf")
+
+
+def _load_concurrently(*kwargs_list):
+    barrier = threading.Barrier(len(kwargs_list))
+    results, errors = [], []
+
+    def load(kwargs):
+        barrier.wait()
+        try:
+            results.append(rag.reload_rag_model(PDF, activate=False, **kwargs))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load, args=(kwargs,)) for kwargs in kwargs_list]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def _forget(doc_hash):
+    try:
+        registry.client.delete_collection(registry.collection_name(doc_hash))
+    except Exception:
+        pass
+    with rag._progress_lock:
+        rag._collections.pop(doc_hash, None)
+
+
+def test_two_concurrent_loads_share_one_build():
+    doc_hash = rag.content_hash(PDF)
+    _forget(doc_hash)
+    results, errors = _load_concurrently({}, {})
+    assert errors == []
+    assert results == [doc_hash, doc_hash]
+    # neither caller returned before the document was complete
+    collection = registry.open(doc_hash, rag.GeminiEmbeddingFunction())
+    assert collection is not None
+    assert collection.count() == collection.metadata["chunks"] > 0
+    assert rag.get_ingest_progress()[doc_hash]["status"] == "ready"
+
+
+def test_load_during_progressive_build_waits_for_completion():
+    doc_hash = rag.content_hash(PDF)
+    _forget(doc_hash)
+    results, errors = _load_concurrently({"progressive": True}, {})
+    assert errors == []
+    assert results == [doc_hash, doc_hash]
+    rag.reload_rag_model(PDF, activate=False)   # returns once any build has finished
+    collection = registry.open(doc_hash, rag.GeminiEmbeddingFunction())
+    assert collection is not None
+    assert collection.count() == collection.metadata["chunks"]
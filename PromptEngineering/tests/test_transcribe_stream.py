@@ -0,0 +1,51 @@
+# tests/test_transcribe_stream.py
+import io
+import os
+import json
+
+import app as app_module
+
+PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "Akhil_LOR_1.pdf")
+FRAME = 8
+
+
+def _events(body: str) -> list:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        events.append((fields.get("event"), json.loads(fields.get("data", "null"))))
+    return events
+
+
+def test_streamed_question_yields_partials_final_and_answer(monkeypatch):
+    monkeypatch.setattr(app_module, "STT_FRAME_BYTES", FRAME)
+    client = app_module.app.test_client()
+    session = {"X-Session-Id": "stream-test"}
+    with open(PDF, "rb") as f:
+        loaded = client.post("/upload-pdf", data={"pdf": (f, os.path.basename(PDF))}, headers=session)
+    assert loaded.status_code == 200
+
+    # one word per frame; the fake recognizer reads each frame as text
+    words = ["what", "is", "this", "letter", "about"]
+    body = b"".join(w.encode("utf-8").ljust(FRAME) for w in words)
+    response = client.post("/transcribe-stream?engine=fake&language=en", input_stream=io.BytesIO(body),
+                           content_type="audio/webm",
+                           headers={**session, "Transfer-Encoding": "chunked"},
+                           environ_overrides={"wsgi.input_terminated": True})
+    assert response.status_code == 200
+    events = _events(response.get_data(as_text=True))
+    names = [name for name, _ in events]
+
+    partials = [data["text"] for name, data in events if name == "partial"]
+    assert partials == [" ".join(words[:i]) for i in range(1, len(words) + 1)]
+    assert ("final", {"text": " ".join(words), "language": "en"}) in events
+    assert "error" not in names
+    assert names.index("final") < names.index("token") < names.index("done")
+    done = events[names.index("done")][1]
+    assert done["answer"]
+
+
+def test_raw_pcm_needs_a_sample_rate():
+    client = app_module.app.test_client()
+    response = client.post("/transcribe-stream?engine=fake&ask=0", data=b"\0" * 64, content_type="audio/l16")
+    assert response.status_code == 400
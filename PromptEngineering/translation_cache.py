@@ -0,0 +1,58 @@
+# translation_cache.py
+"""In-memory LRU of translations.
+
+Questions asked in Hindi are translated to English before retrieval; the
+same question (up to case, spacing and a trailing "?" or "।") is asked
+often enough that remembering the translation saves a Gemini round trip
+on every repeat.
+"""
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+TRANSLATION_CACHE_SIZE = int(os.environ.get("TRANSLATION_CACHE_SIZE", "2048"))
+_TRAILING_PUNCTUATION = "?!.,;:।॥\"'"
+
+
+def normalize_text(text: str) -> str:
+    """Cache key for ``text``; unlike answer_cache.normalize_question it keeps
+    combining marks (Devanagari vowel signs), so different words never collide."""
+    text = unicodedata.normalize("NFC", text or "").casefold()
+    return re.sub(r"\s+", " ", text).strip().rstrip(_TRAILING_PUNCTUATION).rstrip()
+
+
+class TranslationCache:
+    def __init__(self, max_entries: int = TRANSLATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # (target language, normalized text) -> translation
+        self._lock = threading.Lock()
+
+    def get(self, text: str, target_lang: str):
+        key = (target_lang, normalize_text(text))
+        with self._lock:
+            translation = self._entries.get(key)
+            if translation is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return translation
+
+    def put(self, text: str, target_lang: str, translation: str) -> None:
+        key = (target_lang, normalize_text(text))
+        with self._lock:
+            self._entries[key] = translation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+translation_cache = TranslationCache()
@@ -0,0 +1,116 @@
+# tts_cache.py
+"""Content-addressed cache for synthesized speech.
+
+Audio only depends on (text, voice_id, model_id, output_format), so a hash of
+those names the file (CACHE_DIR/tts/<key>.mp3) and doubles as its ETag.
+A fresh synthesis is written to a temporary file while it is streamed to the
+client and only becomes visible once complete, so an aborted request never
+leaves truncated audio behind. The directory is kept under TTS_CACHE_MAX_MB
+by evicting the least recently played files whenever one is added.
+"""
+import os
+import hashlib
+import logging
+import threading
+from uuid import uuid4
+
+from settings import CACHE_DIR
+
+TTS_CACHE_DIR = os.path.join(CACHE_DIR, "tts")
+TTS_CACHE_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+def tts_key(text: str, voice_id: str, model_id: str, output_format: str) -> str:
+    h = hashlib.sha256()
+    for part in (text, voice_id, model_id, output_format):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:40]
+
+
+class TtsCache:
+    def __init__(self, path: str = TTS_CACHE_DIR, max_bytes: int = TTS_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "stored": 0, "aborted": 0, "evicted": 0}
+        self._lock = threading.Lock()
+
+    def _bump(self, **deltas) -> None:
+        with self._lock:
+            for key, value in deltas.items():
+                self.counters[key] += value
+
+    def file_for(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.mp3")
+
+    def get(self, key: str):
+        """Path of the cached audio for ``key``, or None."""
+        path = self.file_for(key)
+        try:
+            os.utime(path)   # mtime is the LRU clock
+        except OSError:
+            self._bump(misses=1)
+            return None
+        self._bump(hits=1)
+        return path
+
+    def tee(self, key: str, chunks):
+        """Yield ``chunks`` unchanged while storing them; the file is kept only if the stream completes."""
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, f".{key}.{uuid4().hex[:8]}.part")
+        complete = False
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in chunks:
+                    if chunk:
+                        f.write(chunk)
+                        yield chunk
+            complete = True
+        finally:
+            if complete:
+                os.replace(tmp, self.file_for(key))
+                self._bump(stored=1)
+                self._evict(keep=key)
+            else:
+                self._bump(aborted=1)
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    def store(self, key: str, chunks) -> str:
+        for _ in self.tee(key, chunks):
+            pass
+        return self.file_for(key)
+
+    def _evict(self, keep: str = None) -> None:
+        files = []
+        for name in os.listdir(self.path):
+            if not name.endswith(".mp3") or name == f"{keep}.mp3":
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in files)
+        try:
+            total += os.path.getsize(self.file_for(keep)) if keep else 0
+        except OSError:
+            pass
+        for _, size, name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+                total -= size
+                self._bump(evicted=1)
+            except OSError as e:
+                logging.warning(f"❌ Failed to evict cached audio {name}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+tts_cache = TtsCache()
@@ -0,0 +1,86 @@
+# tts_pipeline.py
+"""Sentence-pipelined speech synthesis for long texts.
+
+One synthesis request for a long answer cannot start playing until
+ElevenLabs has started on the whole text. Here the text is cut at sentence
+boundaries into short segments (the first one shortest, so audio starts
+quickly), up to TTS_LOOKAHEAD segments are synthesized concurrently ahead
+of the one being played, and their MP3 frames are emitted strictly in order
+as one continuous stream. Neighbouring text is passed as
+previous_text/next_text so the intonation carries across segment joins.
+"""
+import os
+import re
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+TTS_SEGMENT_CHARS = int(os.environ.get("TTS_SEGMENT_CHARS", "400"))
+TTS_FIRST_SEGMENT_CHARS = int(os.environ.get("TTS_FIRST_SEGMENT_CHARS", "160"))
+TTS_LOOKAHEAD = int(os.environ.get("TTS_LOOKAHEAD", "2"))
+
+_SENTENCE_END = re.compile(r"(?<=[.!?।])[\"')\]]*\s+")
+_DONE = object()
+
+
+def split_sentences(text: str, max_chars: int = TTS_SEGMENT_CHARS,
+                    first_chars: int = TTS_FIRST_SEGMENT_CHARS) -> list:
+    """Whole sentences grouped into segments of at most ``max_chars`` (``first_chars`` for the first)."""
+    sentences = [s.strip() for s in _SENTENCE_END.split(text.strip()) if s and s.strip()]
+    segments, current = [], ""
+    for sentence in sentences:
+        limit = first_chars if not segments else max_chars
+        if current and len(current) + 1 + len(sentence) > limit:
+            segments.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+def pipelined_audio(segments: list, synthesize, lookahead: int = TTS_LOOKAHEAD):
+    """
+    Yield the audio of ``segments`` in order. ``synthesize(text, previous_text,
+    next_text)`` returns an iterable of audio chunks; the current segment is
+    streamed as it arrives while up to ``lookahead`` later segments are being
+    synthesized in the background.
+    """
+    if not segments:
+        return
+    stop = threading.Event()
+    buffers = [queue.Queue() for _ in segments]
+
+    def produce(i: int):
+        try:
+            previous_text = segments[i - 1] if i > 0 else None
+            next_text = segments[i + 1] if i + 1 < len(segments) else None
+            for chunk in synthesize(segments[i], previous_text, next_text):
+                if stop.is_set():
+                    return
+                if chunk:
+                    buffers[i].put(chunk)
+        except Exception as e:
+            buffers[i].put(e)
+        finally:
+            buffers[i].put(_DONE)
+
+    pool = ThreadPoolExecutor(max_workers=lookahead + 1, thread_name_prefix="tts")
+    try:
+        submitted = 0
+        for i in range(len(segments)):
+            # keep the segment being played plus ``lookahead`` more in flight
+            while submitted < len(segments) and submitted <= i + lookahead:
+                pool.submit(produce, submitted)
+                submitted += 1
+            while True:
+                item = buffers[i].get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -2,6 +2,7 @@ import React, { useState } from "react";
 import { Upload, FileText, Loader2, AlertCircle } from "lucide-react";
 import { useNavigate } from "react-router-dom";
 import "./LocalPDFUpload.css";
+import { rememberSession, sessionHeaders } from "../session";
 
 const LocalPDFUpload = () => {
   const [file, setFile] = useState(null);
@@ -36,6 +37,7 @@ const LocalPDFUpload = () => {
       // Upload the file to the backend
       const response = await fetch("http://localhost:5001/upload-pdf", {
         method: "POST",
+        headers: sessionHeaders(),
         body: formData,
       });
 
@@ -45,6 +47,7 @@ const LocalPDFUpload = () => {
 
       const result = await response.json();
       console.log("PDF upload successful:", result);
+      rememberSession(result);
       
       // Navigate to PDF viewer
       navigate("/pdf-viewer");
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from "react";
 import { MessageSquare, FileText, Send, Loader2, AlertCircle, Mic, Square, Share2 } from "lucide-react";
 import "./PDFViewer.css";
 import { useLanguage } from "../lang/LanguageContext";
+import { sessionHeaders, withSession } from "../session";
 
 const PDFViewer = () => {
   const [activeTab, setActiveTab] = useState("analysis");
@@ -67,7 +68,7 @@ const PDFViewer = () => {
 
   const { t, language } = useLanguage();
   // PDF URL from local backend
-  const pdfUrl = "http://localhost:5001/pdf";
+  const pdfUrl = withSession("http://localhost:5001/pdf");
   const pageNumberToDivRef = useRef(new Map());
   const [currentPage, setCurrentPage] = useState(1);
   const [totalPages, setTotalPages] = useState(0);
@@ -111,11 +112,15 @@ const PDFViewer = () => {
 
         // First check if backend is responding
         try {
-          const healthCheck = await fetch("http://localhost:5001/pdf", { method: "HEAD" });
+          const healthCheck = await fetch(pdfUrl, { method: "HEAD" });
           if (healthCheck.status === 202) {
             setError("Backend is still loading the PDF. Please wait a moment and refresh the page.");
             return;
           }
+          if (healthCheck.status === 404 || healthCheck.status === 410) {
+            setError("This paper is no longer loaded. Please open it again from the search results.");
+            return;
+          }
         } catch (healthError) {
           console.log("Backend health check failed:", healthError);
         }
@@ -259,9 +264,9 @@ const PDFViewer = () => {
     try {
       const response = await fetch("http://localhost:5001/process-selection", {
         method: "POST",
-        headers: {
+        headers: sessionHeaders({
           "Content-Type": "application/json",
-        },
+        }),
         body: JSON.stringify({ text }),
       });
 
@@ -285,7 +290,7 @@ const PDFViewer = () => {
       setMindmapError("");
       const res = await fetch("http://localhost:5001/mindmap", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: sessionHeaders({ "Content-Type": "application/json" }),
         body: JSON.stringify({ text })
       });
       const data = await res.json();
@@ -446,7 +451,7 @@ document.getElementById('fs').onclick = () => {
         setMindmapError("");
         const res = await fetch("http://localhost:5001/mindmap", {
           method: "POST",
-          headers: { "Content-Type": "application/json" },
+          headers: sessionHeaders({ "Content-Type": "application/json" }),
           body: JSON.stringify({ scope: 'document' })
         });
         const data = await res.json();
@@ -858,9 +863,9 @@ document.getElementById('fs').onclick = () => {
     try {
       const response = await fetch("http://localhost:5001/ask", {
         method: "POST",
-        headers: {
+        headers: sessionHeaders({
           "Content-Type": "application/json",
-        },
+        }),
         body: JSON.stringify({ question: trimmed }),
       });
       const data = await response.json();
@@ -919,9 +924,9 @@ document.getElementById('fs').onclick = () => {
     try {
       const response = await fetch("http://localhost:5001/ask-hindi", {
         method: "POST",
-        headers: {
+        headers: sessionHeaders({
           "Content-Type": "application/json",
-        },
+        }),
         body: JSON.stringify({ question_hi: trimmed }),
       });
       const data = await response.json();
@@ -3,6 +3,7 @@ import { useNavigate } from "react-router-dom";
 import { ExternalLink, FileText, Calendar, User, Loader2 } from "lucide-react";
 import "./ResearchPapers.css";
 import { useLanguage } from "../lang/LanguageContext";
+import { rememberSession, sessionHeaders } from "../session";
 
 const ResearchPapers = () => {
   const [results, setResults] = useState([]);
@@ -44,15 +45,16 @@ const ResearchPapers = () => {
       // Step 2: Update PDF and reload model
       const updateResponse = await fetch("http://localhost:5001/update-pdf", {
         method: "POST",
-        headers: {
+        headers: sessionHeaders({
           "Content-Type": "application/json",
-        },
+        }),
         body: JSON.stringify({ link: paper.url }),
       });
 
       if (!updateResponse.ok) {
         throw new Error("Failed to update PDF");
       }
+      rememberSession(await updateResponse.json());
 
       // Step 3: Navigate to PDF viewer
       navigate("/pdf-viewer");
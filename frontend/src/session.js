@@ -0,0 +1,36 @@
+// Reader session shared with the backend. Each browser tab gets its own id, so
+// readers (or tabs) that load different papers keep separate documents.
+const SESSION_KEY = 'woomSessionId';
+
+const newSessionId = () => {
+  if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+};
+
+export const getSessionId = () => {
+  try {
+    let id = sessionStorage.getItem(SESSION_KEY);
+    if (!id) {
+      id = newSessionId();
+      sessionStorage.setItem(SESSION_KEY, id);
+    }
+    return id;
+  } catch {
+    // storage disabled: keep one id for the lifetime of the page
+    if (!window.__woomSessionId) window.__woomSessionId = newSessionId();
+    return window.__woomSessionId;
+  }
+};
+
+// Adopt the session id the backend answered with (/update-pdf, /upload-pdf)
+export const rememberSession = (result) => {
+  if (!result || !result.session_id) return;
+  try { sessionStorage.setItem(SESSION_KEY, result.session_id); } catch { window.__woomSessionId = result.session_id; }
+};
+
+// Headers for a backend request, with the session id added
+export const sessionHeaders = (headers = {}) => ({ ...headers, 'X-Session-Id': getSessionId() });
+
+// For URLs the browser fetches on its own (pdf.js), which cannot carry headers
+export const withSession = (url) =>
+  `${url}${url.includes('?') ? '&' : '?'}${new URLSearchParams({ session_id: getSessionId() })}`;